@@ -11,6 +11,7 @@ from rich.progress import Progress, SpinnerColumn, TextColumn
 
 from config import get_settings
 from core import create_agent_graph, KnowledgeAgentGraph
+from storage import GraphImportError, current_user
 from tools import tool_registry
 from agent import ReActAgent
 
@@ -29,6 +30,9 @@ class InteractiveCLI:
             self.agent = ReActAgent()
 
         self.thread_id = "cli_session"
+        # 知识库归属的用户，与对话线程分开：/clear 只换线程，不换知识库
+        self.user_id = "cli_user"
+        current_user.set(self.user_id)
 
     def print_banner(self):
         """打印启动横幅"""
@@ -46,6 +50,7 @@ class InteractiveCLI:
 ║    /struct  - 查看图谱结构                                   ║
 ║    /stats   - 查看统计信息                                   ║
 ║    /export  - 导出图谱到 JSON                                ║
+║    /import  - 从 JSON/NDJSON 导入图谱                        ║
 ║    /clear   - 清空对话历史                                   ║
 ║    /mode    - 切换 Agent 模式 (LangGraph/ReAct)              ║
 ║    /help    - 显示帮助信息                                   ║
@@ -56,7 +61,9 @@ class InteractiveCLI:
 
     def handle_command(self, command: str) -> bool | None:
         """处理命令，返回是否继续运行"""
-        cmd = command.lower().strip()
+        parts = command.strip().split(maxsplit=1)
+        cmd = parts[0].lower() if parts else ""
+        arg = parts[1].strip() if len(parts) > 1 else ""
 
         if cmd in ['/quit', '/exit', '/q']:
             self.console.print("👋 再见！", style="yellow")
@@ -74,7 +81,10 @@ class InteractiveCLI:
             self._show_statistics()
 
         elif cmd == '/export':
-            self._export_graph()
+            self._export_graph(arg or "knowledge_graph_export.json")
+
+        elif cmd == '/import':
+            self._import_graph(arg or "knowledge_graph_export.json")
 
         elif cmd == '/clear':
             if self.use_langgraph:
@@ -119,11 +129,49 @@ class InteractiveCLI:
 
         self.console.print(table)
 
-    def _export_graph(self):
-        """导出图谱"""
-        filepath = "knowledge_graph_export.json"
-        tool_registry.graph_store.export_to_json(filepath)
-        self.console.print(f"✅ 已导出到 {filepath}", style="green")
+    def _export_graph(self, filepath: str):
+        """导出图谱（.ndjson/.jsonl 扩展名导出为 NDJSON）"""
+        counts = tool_registry.graph_store.export_to_json(filepath)
+        self.console.print(
+            f"✅ 已导出到 {filepath} ({counts['nodes']} 个知识点, {counts['edges']} 条依赖)",
+            style="green"
+        )
+
+    def _import_graph(self, filepath: str):
+        """从 JSON/NDJSON 导入图谱，并按批同步向量库"""
+        vector_store = tool_registry.vector_store
+
+        def sync_vectors(nodes):
+            vector_store.add_batch([
+                (
+                    node.id,
+                    f"{node.id} {node.description} {' '.join(node.aliases)}".strip(),
+                    {
+                        "name": node.id,
+                        "description": node.description,
+                        "aliases": ",".join(node.aliases)
+                    }
+                )
+                for node in nodes
+            ])
+
+        try:
+            counts = tool_registry.graph_store.import_from_json(filepath, on_nodes=sync_vectors)
+        except FileNotFoundError:
+            self.console.print(f"❌ 文件不存在: {filepath}", style="red")
+            return
+        except GraphImportError as e:
+            # 出错前的批次已提交并同步了向量库，只报告部分导入的结果
+            self.console.print(
+                f"⚠️ 导入中断: {e}\n"
+                f"   已部分导入 {e.counts['nodes']} 个知识点, {e.counts['edges']} 条依赖，其余记录未写入",
+                style="yellow"
+            )
+            return
+        self.console.print(
+            f"✅ 已从 {filepath} 导入 {counts['nodes']} 个知识点, {counts['edges']} 条依赖",
+            style="green"
+        )
 
     def _toggle_mode(self):
         """切换 Agent 模式"""
@@ -159,7 +207,8 @@ class InteractiveCLI:
 | /graph | 查看所有知识点 |
 | /struct | 查看图谱结构 |
 | /stats | 查看统计信息 |
-| /export | 导出图谱到 JSON |
+| /export [路径] | 导出图谱到 JSON（.ndjson 扩展名导出为 NDJSON） |
+| /import [路径] | 从 JSON/NDJSON 导入图谱 |
 | /obsidian-sync | 同步到 Obsidian |
 | /obsidian-import | 从 Obsidian 导入 |
 | /obsidian-export | 导出到 Obsidian 文件夹 |
@@ -173,7 +222,7 @@ class InteractiveCLI:
     def chat(self, user_input: str) -> str:
         """发送消息给 Agent（非流式）"""
         if self.use_langgraph:
-            return self.agent.invoke(user_input, self.thread_id)
+            return self.agent.invoke(user_input, self.thread_id, user_id=self.user_id)
         else:
             return self.agent.chat(user_input)
 
@@ -240,7 +289,7 @@ class InteractiveCLI:
                     current_response = ""
                     
                     # 使用异步生成器处理事件
-                    async for event in self.agent.astream_workflow_events(user_input, self.thread_id):
+                    async for event in self.agent.astream_workflow_events(user_input, self.thread_id, user_id=self.user_id):
                         # 处理不同类型的事件
                         event_type = event.get("event")
                         
@@ -4,7 +4,7 @@
 """
 
 from functools import lru_cache
-from typing import Optional
+from typing import Literal, Optional
 from pydantic_settings import BaseSettings
 from pydantic import Field
 
@@ -29,8 +29,27 @@ class Settings(BaseSettings):
     max_tokens: int = 2048
 
     # 存储配置
+    graph_backend: Literal["sqlite", "memory"] = "sqlite"
+    memory_snapshot_path: Optional[str] = None
     sqlite_db_path: str = "knowledge.db"
     vector_db_path: str = "./chroma_db"
+    embedding_cache_path: Optional[str] = "./embedding_cache.db"  # 为空时不落盘
+
+    # SQLite 连接配置
+    sqlite_pooled: bool = True
+    sqlite_synchronous: str = "NORMAL"
+    sqlite_cache_size_kb: int = 16384
+    sqlite_mmap_size: int = 256 * 1024 * 1024
+    sqlite_stat_counters: bool = False
+    sqlite_closure_table: bool = False
+    sqlite_change_log: bool = False
+    graph_read_workers: int = 4
+    node_cache_size: int = 0  # 节点读缓存条目数，0 表示不启用
+
+    # 按用户分库（每个 thread_id 独立的 SQLite 文件与向量集合）
+    shard_by_user: bool = False
+    user_data_dir: str = "./user_data"
+    max_open_user_stores: int = 32
 
     # Agent 配置
     max_iterations: int = 15
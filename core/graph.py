@@ -3,17 +3,18 @@
 LangGraph 工作流定义
 """
 import sys
-from typing import Literal, Dict, Any, List
+from typing import Literal, Dict, Any, List, Optional
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage, ToolMessage
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_core.runnables import Runnable
+from langchain_core.runnables import Runnable, RunnableLambda
 from langgraph.graph import StateGraph, END
 from langgraph.graph.state import CompiledStateGraph
 from langgraph.prebuilt import ToolNode
 from langgraph.checkpoint.memory import MemorySaver
 
 from config import get_settings
+from storage import current_user, use_user
 from tools import tool_registry
 from agent.prompts import SYSTEM_PROMPT
 from .state import AgentState
@@ -45,8 +46,9 @@ class KnowledgeAgentGraph:
         """构建工作流图"""
         workflow = StateGraph(AgentState)
 
-        workflow.add_node("agent", self._agent_node)
-        workflow.add_node("tools", self._tool_node)
+        # 同时提供同步与异步实现，ainvoke / astream 路径不会阻塞事件循环
+        workflow.add_node("agent", RunnableLambda(self._agent_node, afunc=self._aagent_node))
+        workflow.add_node("tools", RunnableLambda(self._tool_node, afunc=self._atool_node))
 
         workflow.set_entry_point("agent")
 
@@ -63,8 +65,8 @@ class KnowledgeAgentGraph:
 
         return workflow.compile(checkpointer=self.memory)
 
-    def _agent_node(self, state: AgentState) -> Dict[str, Any]:
-        """Agent 决策节点"""
+    def _prepare_agent(self, state: AgentState):
+        """补全系统提示并检查迭代次数，超限时返回结束状态"""
         messages = list(state["messages"])
 
         if not any(isinstance(m, SystemMessage) for m in messages):
@@ -72,15 +74,16 @@ class KnowledgeAgentGraph:
 
         iteration = state.get("iteration", 0) + 1
         if iteration > self.settings.max_iterations:
-            return {
+            return messages, iteration, {
                 "messages": [AIMessage(content="⚠️ 达到最大迭代次数，请简化问题重试")],
                 "is_finished": True,
                 "final_answer": "达到最大迭代次数",
                 "iteration": iteration
             }
+        return messages, iteration, None
 
-        response = self.llm.invoke(messages)
-
+    @staticmethod
+    def _agent_result(response, iteration: int) -> Dict[str, Any]:
         return {
             "messages": [response],
             "iteration": iteration,
@@ -88,55 +91,99 @@ class KnowledgeAgentGraph:
             "final_answer": response.content if not response.tool_calls else None
         }
 
+    def _agent_node(self, state: AgentState) -> Dict[str, Any]:
+        """Agent 决策节点"""
+        messages, iteration, finished = self._prepare_agent(state)
+        if finished:
+            return finished
+
+        response = self.llm.invoke(messages)
+        return self._agent_result(response, iteration)
+
+    async def _aagent_node(self, state: AgentState) -> Dict[str, Any]:
+        """Agent 决策节点（异步）"""
+        messages, iteration, finished = self._prepare_agent(state)
+        if finished:
+            return finished
+
+        response = await self.llm.ainvoke(messages)
+        return self._agent_result(response, iteration)
+
+    @staticmethod
+    def _tool_calls(state: AgentState) -> List[Dict[str, Any]]:
+        last_message = state["messages"][-1]
+        return getattr(last_message, "tool_calls", None) or []
+
+    @staticmethod
+    def _record_tool_call(tool_call, result, error, tool_results: List, tool_messages: List):
+        """记录单次工具调用的结果或错误"""
+        tool_name = tool_call["name"]
+        tool_args = tool_call["args"]
+        if error is None:
+            tool_results.append({
+                "tool": tool_name,
+                "args": tool_args,
+                "result": result
+            })
+            content = str(result)
+        else:
+            tool_results.append({
+                "tool": tool_name,
+                "args": tool_args,
+                "error": str(error)
+            })
+            content = f"❌ 工具执行错误: {str(error)}"
+        tool_messages.append(ToolMessage(content=content, tool_call_id=tool_call["id"]))
+
+    @staticmethod
+    def _unknown_tool(tool_call, tool_messages: List):
+        tool_messages.append(
+            ToolMessage(
+                content=f"❌ 未知工具: {tool_call['name']}",
+                tool_call_id=tool_call["id"]
+            )
+        )
+
     def _tool_node(self, state: AgentState) -> Dict[str, Any]:
         """工具执行节点"""
-        messages = state["messages"]
-        last_message = messages[-1]
-
         tool_results = []
         tool_messages = []
 
-        if hasattr(last_message, 'tool_calls') and last_message.tool_calls:
-            for tool_call in last_message.tool_calls:
-                tool_name = tool_call["name"]
-                tool_args = tool_call["args"]
+        for tool_call in self._tool_calls(state):
+            tool = tool_registry.get(tool_call["name"])
+            if not tool:
+                self._unknown_tool(tool_call, tool_messages)
+                continue
+            try:
+                result, error = tool.invoke(tool_call["args"]), None
+            except Exception as e:
+                result, error = None, e
+            self._record_tool_call(tool_call, result, error, tool_results, tool_messages)
 
-                tool = tool_registry.get(tool_name)
-                if tool:
-                    try:
-                        result = tool.invoke(tool_args)
-                        tool_results.append({
-                            "tool": tool_name,
-                            "args": tool_args,
-                            "result": result
-                        })
-                        tool_messages.append(
-                            ToolMessage(
-                                content=str(result),
-                                tool_call_id=tool_call["id"]
-                            )
-                        )
-                    except Exception as e:
-                        error_msg = f"❌ 工具执行错误: {str(e)}"
-                        tool_results.append({
-                            "tool": tool_name,
-                            "args": tool_args,
-                            "error": str(e)
-                        })
-                        tool_messages.append(
-                            ToolMessage(
-                                content=error_msg,
-                                tool_call_id=tool_call["id"]
-                            )
-                        )
-                else:
-                    error_msg = f"❌ 未知工具: {tool_name}"
-                    tool_messages.append(
-                        ToolMessage(
-                            content=error_msg,
-                            tool_call_id=tool_call["id"]
-                        )
-                    )
+        return {
+            "messages": tool_messages,
+            "tool_results": tool_results
+        }
+
+    async def _atool_node(self, state: AgentState) -> Dict[str, Any]:
+        """工具执行节点（异步）
+
+        同一会话内的工具调用按顺序执行（后一个调用可能依赖前一个的写入），
+        存储 I/O 在 async_graph_store 的线程中完成，不同会话之间互不阻塞。
+        """
+        tool_results = []
+        tool_messages = []
+
+        for tool_call in self._tool_calls(state):
+            tool = tool_registry.get(tool_call["name"])
+            if not tool:
+                self._unknown_tool(tool_call, tool_messages)
+                continue
+            try:
+                result, error = await tool.ainvoke(tool_call["args"]), None
+            except Exception as e:
+                result, error = None, e
+            self._record_tool_call(tool_call, result, error, tool_results, tool_messages)
 
         return {
             "messages": tool_messages,
@@ -156,7 +203,7 @@ class KnowledgeAgentGraph:
 
         return "end"
 
-    def invoke(self, user_input: str, thread_id: str = "default") -> str:
+    def invoke(self, user_input: str, thread_id: str = "default", user_id: Optional[str] = None) -> str:
         """执行对话"""
         config = {"configurable": {"thread_id": thread_id}}
 
@@ -169,7 +216,9 @@ class KnowledgeAgentGraph:
             "context": {}
         }
 
-        result = self.graph.invoke(initial_state, config)
+        # 按用户分库时，工具通过 current_user 找到该用户的存储；未指定用户时沿用当前（默认）用户，不按线程拆库
+        with use_user(user_id or current_user.get()):
+            result = self.graph.invoke(initial_state, config)
 
         # 提取最终回复
         messages = result.get("messages", [])
@@ -179,7 +228,7 @@ class KnowledgeAgentGraph:
 
         return result.get("final_answer", "处理完成")
 
-    async def ainvoke(self, user_input: str, thread_id: str = "default") -> str:
+    async def ainvoke(self, user_input: str, thread_id: str = "default", user_id: Optional[str] = None) -> str:
         """异步执行对话"""
         config = {"configurable": {"thread_id": thread_id}}
 
@@ -192,7 +241,8 @@ class KnowledgeAgentGraph:
             "context": {}
         }
 
-        result = await self.graph.ainvoke(initial_state, config)
+        with use_user(user_id or current_user.get()):
+            result = await self.graph.ainvoke(initial_state, config)
 
         messages = result.get("messages", [])
         for msg in reversed(messages):
@@ -201,7 +251,7 @@ class KnowledgeAgentGraph:
 
         return result.get("final_answer", "处理完成")
 
-    def chat_stream(self, user_input: str, thread_id: str = "default"):
+    def chat_stream(self, user_input: str, thread_id: str = "default", user_id: Optional[str] = None):
         """真正的流式执行"""
         # 1. 构建包含历史记录的完整消息列表
         config = {"configurable": {"thread_id": thread_id}}
@@ -221,18 +271,29 @@ class KnowledgeAgentGraph:
         }
         
         # 4. 使用LangGraph的stream方法执行工作流
-        for event in self.graph.stream(initial_state, config):
-            # 5. 处理每个事件，提取并返回LLM的流式输出
-            if "agent" in event:
-                agent_state = event["agent"]
-                messages = agent_state.get("messages", [])
-                if messages:
-                    last_message = messages[-1]
-                    # 检查是否是流式输出块
-                    if hasattr(last_message, "content"):
-                        yield last_message.content
-
-    async def astream_workflow_events(self, user_input: str, thread_id: str = "default"):
+        # 生成器可能被提前丢弃并在其他上下文中关闭，用户只在每一步推进时设置，不跨 yield 持有
+        user_id = user_id or current_user.get()
+        events = self.graph.stream(initial_state, config)
+        try:
+            while True:
+                with use_user(user_id):
+                    event = next(events, None)
+                if event is None:
+                    break
+                # 5. 处理每个事件，提取并返回LLM的流式输出
+                if "agent" in event:
+                    agent_state = event["agent"]
+                    messages = agent_state.get("messages", [])
+                    if messages:
+                        last_message = messages[-1]
+                        # 检查是否是流式输出块
+                        if hasattr(last_message, "content"):
+                            yield last_message.content
+        finally:
+            with use_user(user_id):
+                events.close()
+
+    async def astream_workflow_events(self, user_input: str, thread_id: str = "default", user_id: Optional[str] = None):
         """使用astream_events方法实现流式输出（LangChain v0.2+推荐）"""
         # 1. 构建配置和初始状态
         config = {"configurable": {"thread_id": thread_id}}
@@ -246,8 +307,20 @@ class KnowledgeAgentGraph:
         }
         
         # 2. 使用LangGraph的astream_events方法执行工作流
-        async for event in self.graph.astream_events(initial_state, config, version="v1"):
-            yield event
+        # 消费方提前停止迭代时生成器会在其他上下文中收尾，用户只在每一步推进时设置，不跨 yield 持有
+        user_id = user_id or current_user.get()
+        events = self.graph.astream_events(initial_state, config, version="v1")
+        try:
+            while True:
+                with use_user(user_id):
+                    try:
+                        event = await events.__anext__()
+                    except StopAsyncIteration:
+                        break
+                yield event
+        finally:
+            with use_user(user_id):
+                await events.aclose()
 
 
 def create_agent_graph() -> KnowledgeAgentGraph:
@@ -1,6 +1,12 @@
 # storage/__init__.py
-from .base import BaseGraphStorage, BaseVectorStorage, KnowledgeNode, KnowledgeEdge, Problem
+from .base import BaseGraphStorage, BaseVectorStorage, KnowledgeNode, KnowledgeEdge, NodeRow, Problem, Change, Subgraph, GraphImportError
+from .compact_graph import CompactGraph, NodeRecord
 from .sqlite_store import SQLiteGraphStore
+from .memory_store import MemoryGraphStore
+from .cached_store import CachedGraphStore
+from .async_store import AsyncGraphStore
 from .vector_store import ChromaVectorStore
+from .embedding_cache import EmbeddingCache
+from .router import StoreRouter, UserStores, current_user, use_user, user_slug
 
-__all__ = ["BaseGraphStorage", "BaseVectorStorage", "KnowledgeNode", "KnowledgeEdge", "Problem", "SQLiteGraphStore", "ChromaVectorStore"]
+__all__ = ["BaseGraphStorage", "BaseVectorStorage", "KnowledgeNode", "KnowledgeEdge", "NodeRow", "Problem", "Change", "Subgraph", "GraphImportError", "CompactGraph", "NodeRecord", "SQLiteGraphStore", "MemoryGraphStore", "CachedGraphStore", "AsyncGraphStore", "ChromaVectorStore", "EmbeddingCache", "StoreRouter", "UserStores", "current_user", "use_user", "user_slug"]
@@ -0,0 +1,133 @@
+# storage/adjacency.py
+"""
+内存邻接索引 - 供图存储缓存边结构，避免每次路径查询都全表读取
+"""
+
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+
+class AdjacencyIndex:
+    """前向/反向邻接表
+
+    generation 对应数据库中的边结构代数，用于判断缓存是否落后于其他进程的写入；
+    order 为持久化的拓扑序号（node -> ord），边 u -> v 满足 order[u] < order[v]。
+    """
+
+    def __init__(self, generation: int = 0):
+        self.forward: Dict[str, Dict[str, float]] = {}  # source -> {target: weight}
+        self.reverse: Dict[str, Dict[str, float]] = {}  # target -> {source: weight}
+        self.order: Dict[str, int] = {}
+        self.generation = generation
+
+    @classmethod
+    def from_edges(
+            cls,
+            edges: Iterable[Tuple[str, str, float]],
+            generation: int = 0
+    ) -> "AdjacencyIndex":
+        """由 (source, target, weight) 序列构建"""
+        index = cls(generation)
+        for source, target, weight in edges:
+            index.add_edge(source, target, weight)
+        return index
+
+    def __contains__(self, node_id: str) -> bool:
+        return node_id in self.forward or node_id in self.reverse
+
+    def add_edge(self, source: str, target: str, weight: float = 1.0):
+        """添加或更新边"""
+        self.forward.setdefault(source, {})[target] = weight
+        self.reverse.setdefault(target, {})[source] = weight
+
+    def remove_edge(self, source: str, target: str):
+        """删除边"""
+        targets = self.forward.get(source)
+        if targets is not None:
+            targets.pop(target, None)
+            if not targets:
+                del self.forward[source]
+        sources = self.reverse.get(target)
+        if sources is not None:
+            sources.pop(source, None)
+            if not sources:
+                del self.reverse[target]
+
+    def remove_node(self, node_id: str):
+        """删除节点及其所有边"""
+        for target in list(self.forward.get(node_id, {})):
+            self.remove_edge(node_id, target)
+        for source in list(self.reverse.get(node_id, {})):
+            self.remove_edge(source, node_id)
+        self.order.pop(node_id, None)
+
+    def successors(self, node_id: str) -> Dict[str, float]:
+        return self.forward.get(node_id, {})
+
+    def predecessors(self, node_id: str) -> Dict[str, float]:
+        return self.reverse.get(node_id, {})
+
+    def ancestors(self, node_id: str) -> Set[str]:
+        """所有前置节点（不含自身）"""
+        return self._reachable(node_id, self.reverse)
+
+    def descendants(self, node_id: str) -> Set[str]:
+        """所有后续节点（不含自身）"""
+        return self._reachable(node_id, self.forward)
+
+    def distances(self, node_id: str, reverse: bool = False) -> Dict[str, int]:
+        """BFS 最短跳数（不含自身），reverse=True 时沿入边方向"""
+        adjacency = self.reverse if reverse else self.forward
+        depths: Dict[str, int] = {}
+        queue = deque([(node_id, 0)])
+        while queue:
+            current, depth = queue.popleft()
+            for neighbor in adjacency.get(current, ()):
+                if neighbor not in depths and neighbor != node_id:
+                    depths[neighbor] = depth + 1
+                    queue.append((neighbor, depth + 1))
+        return depths
+
+    @staticmethod
+    def _reachable(node_id: str, adjacency: Dict[str, Dict[str, float]]) -> Set[str]:
+        seen: Set[str] = set()
+        queue = deque([node_id])
+        while queue:
+            current = queue.popleft()
+            for neighbor in adjacency.get(current, ()):
+                if neighbor not in seen:
+                    seen.add(neighbor)
+                    queue.append(neighbor)
+        seen.discard(node_id)
+        return seen
+
+    def sort_by_order(self, nodes: Iterable[str]) -> List[str]:
+        """按持久化拓扑序号排序（无序号的节点排在最后）"""
+        return sorted(nodes, key=lambda node: (self.order.get(node, float("inf")), node))
+
+    def topological_sort(self, nodes: Iterable[str], strict: bool = True) -> Optional[List[str]]:
+        """对 nodes 诱导的子图做拓扑排序
+
+        存在环时 strict=True 返回 None；strict=False 则把环上（及其下游）节点按 ID 排在最后。
+        """
+        nodes = set(nodes)
+        in_degree = {
+            node: sum(1 for source in self.reverse.get(node, ()) if source in nodes)
+            for node in nodes
+        }
+        queue = deque(sorted(node for node, degree in in_degree.items() if degree == 0))
+        order = []
+        while queue:
+            current = queue.popleft()
+            order.append(current)
+            for target in self.forward.get(current, ()):
+                if target in in_degree:
+                    in_degree[target] -= 1
+                    if in_degree[target] == 0:
+                        queue.append(target)
+
+        if len(order) != len(nodes):
+            if strict:
+                return None
+            order.extend(sorted(nodes - set(order)))
+        return order
@@ -0,0 +1,76 @@
+# storage/async_store.py
+"""
+异步图存储 - 供 ainvoke / astream 路径使用，避免阻塞事件循环
+
+读操作分发到读线程池并发执行（WAL 模式下互不阻塞），写操作统一交给单个写线程串行执行，
+不同会话的磁盘 I/O 因此不会在事件循环线程上相互排队。
+"""
+
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from .base import BaseGraphStorage
+
+
+class AsyncGraphStore:
+    """BaseGraphStorage 的异步包装
+
+    store 上的任意方法都可以 await 调用（如 await store.get_node(...)），
+    写方法自动路由到写线程；run() 可把一段包含多次存储调用的同步逻辑整体放到线程中执行。
+    事务状态绑定在线程上，transaction() 只能在 run(..., write=True) 的函数内部使用。
+    """
+
+    WRITE_METHODS = frozenset({
+        "add_node", "add_nodes", "update_node", "delete_node", "merge_nodes", "clear",
+        "add_edge", "add_edges", "add_problem", "add_problems",
+        "import_from_json", "import_ndjson", "rebuild_closure",
+    })
+    THREAD_BOUND_METHODS = frozenset({"transaction", "call_after_commit"})
+
+    def __init__(self, store: BaseGraphStorage, read_workers: int = 4):
+        self.store = store
+        self._readers = ThreadPoolExecutor(max_workers=read_workers, thread_name_prefix="graph-read")
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="graph-write")
+
+    async def run(self, func: Callable, *args, write: bool = False, **kwargs) -> Any:
+        """在读线程池或写线程中执行 func，并沿用调用方的 contextvars"""
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        executor = self._writer if write else self._readers
+        return await loop.run_in_executor(
+            executor, functools.partial(context.run, func, *args, **kwargs)
+        )
+
+    def call_write(self, func: Callable, *args, **kwargs) -> Any:
+        """在写线程中同步执行 func 并等待结果，供已在读线程池中运行的同步代码提交写入
+
+        只把事务性的图变更交给写线程，调用方的网络 I/O（向量检索、embedding）留在原线程。
+        """
+        if threading.current_thread().name.startswith("graph-write"):
+            return func(*args, **kwargs)
+        context = contextvars.copy_context()
+        return self._writer.submit(context.run, func, *args, **kwargs).result()
+
+    def __getattr__(self, name: str) -> Any:
+        if name in self.THREAD_BOUND_METHODS:
+            raise AttributeError(f"{name} 依赖线程内的连接状态，请在 run(..., write=True) 中使用")
+        attr = getattr(self.store, name)
+        if not callable(attr):
+            return attr
+
+        write = name in self.WRITE_METHODS
+
+        @functools.wraps(attr)
+        async def method(*args, **kwargs):
+            return await self.run(attr, *args, write=write, **kwargs)
+
+        return method
+
+    def close(self):
+        """等待进行中的操作完成并关闭线程"""
+        self._readers.shutdown(wait=True)
+        self._writer.shutdown(wait=True)
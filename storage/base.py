@@ -3,11 +3,18 @@
 存储抽象基类
 """
 
+import json
+import re
 from abc import ABC, abstractmethod
-from typing import Dict, List, Optional, Any, TypeVar, Generic
-from dataclasses import dataclass, field
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Any, Callable, TypeVar, Generic, Iterable, Iterator, Sequence, Tuple, Union
+from dataclasses import dataclass, field, replace
 from datetime import datetime
 
+from .adjacency import AdjacencyIndex
+from .compact_graph import CompactGraph
+from .json_stream import iter_json_arrays, iter_ndjson
+
 
 @dataclass
 class KnowledgeNode:
@@ -43,6 +50,87 @@ class KnowledgeNode:
         )
 
 
+NODE_FIELDS = ("id", "description", "difficulty", "proficiency", "aliases", "metadata")
+
+
+class NodeRow:
+    """轻量节点行 - aliases / metadata 保留原始 JSON，首次访问时才解码
+
+    按 fields 投影查询时未选取的字段取默认值。
+    """
+    __slots__ = ("id", "description", "difficulty", "proficiency", "_aliases", "_metadata")
+
+    def __init__(
+            self,
+            id: str,
+            description: str = "",
+            difficulty: int = 1,
+            proficiency: float = 0.0,
+            aliases: Union[str, List[str]] = "[]",
+            metadata: Union[str, Dict[str, Any]] = "{}"
+    ):
+        self.id = id
+        self.description = description
+        self.difficulty = difficulty
+        self.proficiency = proficiency
+        self._aliases = aliases
+        self._metadata = metadata
+
+    @property
+    def aliases(self) -> List[str]:
+        if isinstance(self._aliases, str):
+            self._aliases = json.loads(self._aliases)
+        return self._aliases
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        if isinstance(self._metadata, str):
+            self._metadata = json.loads(self._metadata)
+        return self._metadata
+
+    @classmethod
+    def from_node(cls, node: KnowledgeNode) -> "NodeRow":
+        return cls(node.id, node.description, node.difficulty, node.proficiency, node.aliases, node.metadata)
+
+    def to_node(self) -> KnowledgeNode:
+        return KnowledgeNode(
+            id=self.id,
+            description=self.description,
+            difficulty=self.difficulty,
+            proficiency=self.proficiency,
+            aliases=self.aliases,
+            metadata=self.metadata,
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return self.to_node().to_dict()
+
+    def __repr__(self) -> str:
+        return f"NodeRow(id={self.id!r}, difficulty={self.difficulty}, proficiency={self.proficiency})"
+
+
+def proficiency_bucket(proficiency: float) -> str:
+    """熟练度分档：未学习 (<0.3) / 学习中 (<0.7) / 已掌握"""
+    if proficiency < 0.3:
+        return "未学习"
+    if proficiency < 0.7:
+        return "学习中"
+    return "已掌握"
+
+
+def normalize_text(text: str) -> str:
+    """文本匹配用的归一化：小写并去掉空白、标点"""
+    return re.sub(r"[\W_]+", "", text.lower())
+
+
+def check_node_fields(fields: Sequence[str]) -> List[str]:
+    """校验投影字段，返回按 NODE_FIELDS 顺序排列且包含 id 的列名"""
+    unknown = set(fields) - set(NODE_FIELDS)
+    if unknown:
+        raise ValueError(f"未知的节点字段: {', '.join(sorted(unknown))}")
+    return [name for name in NODE_FIELDS if name == "id" or name in fields]
+
+
 @dataclass
 class KnowledgeEdge:
     """知识点依赖边"""
@@ -63,9 +151,64 @@ class Problem:
     created_at: datetime = field(default_factory=datetime.now)
 
 
+@dataclass
+class Change:
+    """变更日志条目"""
+    seq: int
+    entity: str  # node / edge / proficiency / graph
+    op: str  # insert / update / delete；graph 为 clear
+    entity_id: str  # 节点 ID；边为 JSON 数组 [source, target]；graph 为空串
+    payload: Optional[Dict[str, Any]] = None  # 变更后的值，删除时为空
+    created_at: Optional[str] = None
+
+
+@dataclass
+class Subgraph:
+    """种子节点的 k 跳邻域子图"""
+    nodes: List[NodeRow]  # 按跳数、相关度排序，种子在前
+    edges: List[KnowledgeEdge]  # 保留节点之间的全部边
+    hops: Dict[str, int]  # 节点 -> 距最近种子的跳数
+    truncated: bool = False  # 是否因 max_nodes 丢弃过候选节点
+
+
+SUBGRAPH_FIELDS = ("description", "difficulty", "proficiency")
+
+
+class GraphImportError(ValueError):
+    """导入中途失败（格式错误、字段缺失或边成环），counts 为出错前已提交的节点/边数"""
+
+    def __init__(self, message: str, counts: Dict[str, int]):
+        super().__init__(message)
+        self.counts = dict(counts)
+
+
 class BaseGraphStorage(ABC):
     """图存储抽象基类"""
 
+    @contextmanager
+    def transaction(self):
+        """工作单元（默认无事务语义，由具体存储覆盖）"""
+        yield self
+
+    def close(self):
+        """释放存储占用的资源（默认无操作）"""
+        pass
+
+    def data_version(self) -> Optional[int]:
+        """数据版本号，其他进程提交写入后会变化；None 表示不支持检测（默认）"""
+        return None
+
+    def last_commit_versions(self) -> Optional[Tuple[int, Optional[int]]]:
+        """本线程最近一次写入提交前后的 data_version：(提交前, 提交后)
+
+        提交后到读取之间若有其他连接提交，提交后的值为 None；None 表示不支持（默认）。
+        """
+        return None
+
+    def call_after_commit(self, callback: Callable, *args, **kwargs):
+        """提交后执行回调（默认立即执行）"""
+        callback(*args, **kwargs)
+
     @abstractmethod
     def add_node(self, node: KnowledgeNode) -> str:
         """添加节点"""
@@ -76,6 +219,24 @@ class BaseGraphStorage(ABC):
         """获取节点"""
         pass
 
+    def get_nodes(
+            self,
+            node_ids: List[str],
+            fields: Optional[Sequence[str]] = None
+    ) -> Dict[str, Union[KnowledgeNode, NodeRow]]:
+        """批量获取节点（默认逐个调用 get_node），缺失的 ID 不出现在结果中
+
+        指定 fields 时返回 NodeRow 投影。
+        """
+        if fields is not None:
+            check_node_fields(fields)
+        nodes = {}
+        for node_id in node_ids:
+            node = self.get_node(node_id)
+            if node:
+                nodes[node_id] = node if fields is None else NodeRow.from_node(node)
+        return nodes
+
     @abstractmethod
     def update_node(self, node: KnowledgeNode) -> bool:
         """更新节点"""
@@ -91,6 +252,22 @@ class BaseGraphStorage(ABC):
         """添加边"""
         pass
 
+    def add_nodes(self, nodes: List[KnowledgeNode]) -> int:
+        """批量添加节点（默认逐个调用 add_node）"""
+        count = 0
+        for node in nodes:
+            self.add_node(node)
+            count += 1
+        return count
+
+    def add_edges(self, edges: List[KnowledgeEdge]) -> int:
+        """批量添加边（默认逐个调用 add_edge）"""
+        count = 0
+        for edge in edges:
+            self.add_edge(edge)
+            count += 1
+        return count
+
     @abstractmethod
     def get_prerequisites(self, node_id: str) -> List[str]:
         """获取前置知识"""
@@ -101,9 +278,22 @@ class BaseGraphStorage(ABC):
         """获取后续知识"""
         pass
 
+    def is_prerequisite(self, ancestor: str, descendant: str) -> bool:
+        """ancestor 是否为 descendant 的（直接或间接）前置知识（默认沿前置关系 BFS）"""
+        seen = set()
+        stack = [descendant]
+        while stack:
+            for prereq in self.get_prerequisites(stack.pop()):
+                if prereq == ancestor:
+                    return True
+                if prereq not in seen:
+                    seen.add(prereq)
+                    stack.append(prereq)
+        return False
+
     @abstractmethod
-    def get_all_nodes(self) -> List[KnowledgeNode]:
-        """获取所有节点"""
+    def get_all_nodes(self, fields: Optional[Sequence[str]] = None) -> List[Union[KnowledgeNode, NodeRow]]:
+        """获取所有节点，指定 fields 时返回只含这些字段的 NodeRow"""
         pass
 
     @abstractmethod
@@ -111,6 +301,372 @@ class BaseGraphStorage(ABC):
         """获取所有边"""
         pass
 
+    def iter_nodes(
+            self,
+            batch_size: int = 500,
+            after: Optional[str] = None,
+            fields: Optional[Sequence[str]] = None
+    ) -> Iterator[Union[KnowledgeNode, NodeRow]]:
+        """按 ID 顺序遍历 ID 大于 after 的节点（默认基于 get_all_nodes）"""
+        for node in sorted(self.get_all_nodes(fields=fields), key=lambda n: n.id):
+            if after is None or node.id > after:
+                yield node
+
+    def iter_edges(
+            self,
+            batch_size: int = 500,
+            after: Optional[Tuple[str, str]] = None
+    ) -> Iterator[KnowledgeEdge]:
+        """按 (source, target) 顺序遍历大于 after 的边（默认基于 get_all_edges）"""
+        for edge in sorted(self.get_all_edges(), key=lambda e: (e.source, e.target)):
+            if after is None or (edge.source, edge.target) > tuple(after):
+                yield edge
+
+    def get_compact_graph(self) -> CompactGraph:
+        """构建紧凑只读图视图（默认基于 iter_nodes / iter_edges）"""
+        return CompactGraph.build(
+            ((n.id, n.difficulty, n.proficiency)
+             for n in self.iter_nodes(fields=("difficulty", "proficiency"))),
+            ((e.source, e.target, e.weight) for e in self.iter_edges())
+        )
+
+    def node_exists(self, node_id: str) -> bool:
+        """检查节点是否存在"""
+        return self.get_node(node_id) is not None
+
+    def find_by_alias(self, alias: str) -> Optional[str]:
+        """通过别名查找节点（大小写不敏感，优先匹配节点 ID；默认遍历全部节点）"""
+        key = alias.lower()
+        matched = None
+        for node in self.iter_nodes(fields=("aliases",)):
+            if node.id.lower() == key:
+                return node.id
+            if matched is None and any(a.lower() == key for a in node.aliases):
+                matched = node.id
+        return matched
+
+    def search_lexical(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
+        """全文检索节点，返回 [{"id", "score"}]（默认不支持，返回空列表）"""
+        return []
+
+    def find_by_text(self, query: str, min_coverage: float = 0.75) -> Optional[str]:
+        """全文检索的高置信命中（默认不支持，返回 None）"""
+        return None
+
+    def get_learning_path(self, target_node: str) -> List[str]:
+        """获取学习路径：全部前置知识按拓扑序排列，最后是目标本身（默认基于 iter_edges）"""
+        adjacency = AdjacencyIndex.from_edges(
+            (e.source, e.target, e.weight) for e in self.iter_edges()
+        )
+        ancestors = adjacency.ancestors(target_node)
+        return adjacency.topological_sort(ancestors, strict=False) + [target_node]
+
+    def _neighbor_edges(self, node_ids: List[str], direction: str) -> List[Tuple[str, str, float]]:
+        """node_ids 的入边（up）或出边（down），返回 (source, target, weight)（默认基于 iter_edges）"""
+        wanted = set(node_ids)
+        return [
+            (e.source, e.target, e.weight) for e in self.iter_edges()
+            if (e.target if direction == "up" else e.source) in wanted
+        ]
+
+    def get_subgraph(
+            self,
+            seeds: Sequence[str],
+            max_hops: int = 2,
+            max_nodes: int = 30,
+            direction: str = "up",
+            min_weight: float = 0.0
+    ) -> Subgraph:
+        """从种子出发按层 BFS 提取邻域子图，节点数不超过 max_nodes
+
+        direction: up 沿前置方向，down 沿后续方向，both 两个方向。
+        每个候选的相关度 = 父节点相关度 × 边权重 × (1 - 熟练度 / 2)，
+        即弱依赖和已掌握的节点优先被裁掉；权重低于 min_weight 的边不展开。
+        每一跳只查询一次边和一次节点，与整图规模无关。
+        """
+        if direction not in ("up", "down", "both"):
+            raise ValueError(f"未知的方向: {direction}")
+        directions = ("up", "down") if direction == "both" else (direction,)
+
+        rows = self.get_nodes(list(seeds), fields=SUBGRAPH_FIELDS)
+        kept = {seed: rows[seed] for seed in dict.fromkeys(seeds) if seed in rows}
+        kept = dict(list(kept.items())[:max_nodes])
+        score = {node_id: 1.0 for node_id in kept}
+        hops = {node_id: 0 for node_id in kept}
+        truncated = len(rows) > len(kept)
+
+        frontier = list(kept)
+        for hop in range(1, max_hops + 1):
+            if not frontier:
+                break
+            candidates: Dict[str, float] = {}
+            for side in directions:
+                for source, target, weight in self._neighbor_edges(frontier, side):
+                    parent, neighbor = (target, source) if side == "up" else (source, target)
+                    if neighbor in kept or weight < min_weight:
+                        continue
+                    candidates[neighbor] = max(candidates.get(neighbor, 0.0), score[parent] * weight)
+
+            if len(kept) >= max_nodes:
+                # 预算已用完，但仍有未访问的邻居
+                truncated = truncated or bool(candidates)
+                break
+
+            rows = self.get_nodes(list(candidates), fields=SUBGRAPH_FIELDS)
+            ranked = sorted(
+                ((candidates[node_id] * (1 - row.proficiency / 2), node_id) for node_id, row in rows.items()),
+                key=lambda item: (-item[0], item[1])
+            )
+            budget = max_nodes - len(kept)
+            truncated = truncated or len(ranked) > budget
+            frontier = []
+            for relevance, node_id in ranked[:budget]:
+                kept[node_id] = rows[node_id]
+                score[node_id] = relevance
+                hops[node_id] = hop
+                frontier.append(node_id)
+
+        edges = [
+            KnowledgeEdge(source=source, target=target, weight=weight)
+            for source, target, weight in self._neighbor_edges(list(kept), "down")
+            if target in kept
+        ]
+        edges.sort(key=lambda e: (e.source, e.target))
+        return Subgraph(nodes=list(kept.values()), edges=edges, hops=hops, truncated=truncated)
+
+    def merge_nodes(self, source_id: str, target_id: str) -> bool:
+        """把 source 合并进 target：边改接到 target（target 已有的同向边保留），别名与元数据并入 target，
+        题目关联改挂到 target，最后删除 source。两者之间的边合并后成为自环，直接丢弃；合并会形成环时抛出 ValueError。
+
+        默认实现基于 iter_edges 在一个事务内完成；任一节点不存在时返回 False。
+        """
+        if source_id == target_id:
+            return False
+
+        with self.transaction():
+            source = self.get_node(source_id)
+            target = self.get_node(target_id)
+            if not source or not target:
+                return False
+
+            existing = (
+                {(target_id, t) for t in self.get_dependents(target_id)}
+                | {(s, target_id) for s in self.get_prerequisites(target_id)}
+            )
+            new_edges = []
+            for edge in self.iter_edges():
+                if {edge.source, edge.target} == {source_id, target_id}:
+                    continue
+                if edge.source == source_id:
+                    moved = replace(edge, source=target_id, metadata=dict(edge.metadata))
+                elif edge.target == source_id:
+                    moved = replace(edge, target=target_id, metadata=dict(edge.metadata))
+                else:
+                    continue
+                if (moved.source, moved.target) not in existing:
+                    new_edges.append(moved)
+
+            target.aliases = [
+                alias for alias in dict.fromkeys(target.aliases + source.aliases + [source_id])
+                if alias != target_id
+            ]
+            target.metadata = {**target.metadata, **source.metadata}
+
+            self._relink_problems(source_id, target_id)
+            self.delete_node(source_id)
+            self.add_edges(new_edges)
+            self.update_node(target)
+        return True
+
+    def _relink_problems(self, source_id: str, target_id: str):
+        """merge_nodes 中把题目的 linked_nodes 从 source 改挂到 target（默认无操作，存储题目的后端需覆盖）"""
+        pass
+
+    def clear(self) -> int:
+        """删除全部节点和边（题目保留），返回删除的节点数（默认逐个 delete_node）"""
+        with self.transaction():
+            node_ids = [node.id for node in self.iter_nodes(fields=("id",))]
+            for node_id in node_ids:
+                self.delete_node(node_id)
+        return len(node_ids)
+
+    def add_problem(self, problem: Problem) -> int:
+        """添加题目"""
+        return self.add_problems([problem])[0]
+
+    @abstractmethod
+    def add_problems(self, problems: List[Problem]) -> List[int]:
+        """批量添加题目，返回新题目 ID"""
+        pass
+
+    def get_problems_by_node(self, node_id: str) -> List[Problem]:
+        """获取节点相关的题目"""
+        return []
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """获取统计信息（默认遍历节点与边计数，不含题目）"""
+        buckets = {"未学习": 0, "学习中": 0, "已掌握": 0}
+        node_count = 0
+        for node in self.iter_nodes(fields=("proficiency",)):
+            node_count += 1
+            buckets[proficiency_bucket(node.proficiency)] += 1
+        return {
+            "node_count": node_count,
+            "edge_count": sum(1 for _ in self.iter_edges()),
+            "problem_count": 0,
+            "proficiency_distribution": buckets,
+        }
+
+    def get_changes(self, since_seq: int = 0, limit: int = 1000) -> List[Change]:
+        """读取 seq 大于 since_seq 的变更（默认不记录变更）"""
+        return []
+
+    def latest_change_seq(self) -> int:
+        """当前最大的变更序号"""
+        return 0
+
+    # 导入导出
+    @staticmethod
+    def _is_ndjson(filepath: str) -> bool:
+        return filepath.lower().endswith((".ndjson", ".jsonl"))
+
+    def export_to_json(self, filepath: str, ndjson: Optional[bool] = None) -> Dict[str, int]:
+        """流式导出到 JSON / NDJSON（按扩展名 .ndjson/.jsonl 自动识别）
+
+        节点和边通过 iter_nodes / iter_edges 分页写出，内存占用与图规模无关。
+        """
+        if ndjson is None:
+            ndjson = self._is_ndjson(filepath)
+
+        counts = {"nodes": 0, "edges": 0}
+        with open(filepath, 'w', encoding='utf-8') as f:
+            if not ndjson:
+                f.write('{\n  "nodes": [')
+
+            for kind, items, to_record in (
+                    ("node", self.iter_nodes(), self._node_record),
+                    ("edge", self.iter_edges(), self._edge_record),
+            ):
+                if not ndjson and kind == "edge":
+                    f.write('\n  ],\n  "edges": [')
+                for item in items:
+                    record = to_record(item)
+                    if ndjson:
+                        record = {"type": kind, **record}
+                        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    else:
+                        f.write("," if counts[kind + "s"] else "")
+                        f.write("\n    " + json.dumps(record, ensure_ascii=False))
+                    counts[kind + "s"] += 1
+
+            if not ndjson:
+                statistics = json.dumps(self.get_statistics(), ensure_ascii=False)
+                f.write(f'\n  ],\n  "statistics": {statistics}\n}}\n')
+        return counts
+
+    @staticmethod
+    def _node_record(node: KnowledgeNode) -> Dict[str, Any]:
+        return node.to_dict()
+
+    @staticmethod
+    def _edge_record(edge: KnowledgeEdge) -> Dict[str, Any]:
+        return {
+            "source": edge.source,
+            "target": edge.target,
+            "weight": edge.weight,
+            "relation_type": edge.relation_type,
+            "metadata": edge.metadata,
+        }
+
+    def import_from_json(
+            self,
+            filepath: str,
+            batch_size: int = 500,
+            on_nodes: Optional[Callable[[List[KnowledgeNode]], None]] = None
+    ) -> Dict[str, int]:
+        """流式导入 export_to_json 导出的 JSON 文件（.ndjson/.jsonl 转交 import_ndjson）
+
+        on_nodes 在每批节点写入后被调用，可用于排队向量库更新。
+        """
+        if self._is_ndjson(filepath):
+            return self.import_ndjson(filepath, batch_size, on_nodes)
+
+        with open(filepath, 'r', encoding='utf-8') as f:
+            records = (
+                (key[:-1], item)
+                for key, item in iter_json_arrays(f)
+                if key in ("nodes", "edges")
+            )
+            return self._import_records(records, batch_size, on_nodes)
+
+    def import_ndjson(
+            self,
+            filepath: str,
+            batch_size: int = 500,
+            on_nodes: Optional[Callable[[List[KnowledgeNode]], None]] = None
+    ) -> Dict[str, int]:
+        """流式导入 NDJSON（每行一个带 type 字段的节点或边）"""
+        with open(filepath, 'r', encoding='utf-8') as f:
+            records = (
+                (record.pop("type", "node"), record)
+                for record in iter_ndjson(f)
+            )
+            return self._import_records(records, batch_size, on_nodes)
+
+    def _import_records(
+            self,
+            records: Iterable[Tuple[str, Dict[str, Any]]],
+            batch_size: int,
+            on_nodes: Optional[Callable[[List[KnowledgeNode]], None]]
+    ) -> Dict[str, int]:
+        """按批写入节点/边记录
+
+        每批单独提交；中途出错时抛出 GraphImportError，已提交的批次保留，counts 记录已写入的数量。
+        """
+        counts = {"nodes": 0, "edges": 0}
+        nodes: List[KnowledgeNode] = []
+        edges: List[KnowledgeEdge] = []
+
+        def flush_nodes():
+            counts["nodes"] += self.add_nodes(nodes)
+            if on_nodes:
+                on_nodes(list(nodes))
+            nodes.clear()
+
+        def flush_edges():
+            # 边可能引用尚在缓冲中的节点，先写入节点
+            if nodes:
+                flush_nodes()
+            counts["edges"] += self.add_edges(edges)
+            edges.clear()
+
+        index = 0
+        try:
+            for index, (kind, record) in enumerate(records, 1):
+                if kind == "node":
+                    nodes.append(KnowledgeNode.from_dict(record))
+                    if len(nodes) >= batch_size:
+                        flush_nodes()
+                elif kind == "edge":
+                    edges.append(KnowledgeEdge(
+                        source=record["source"],
+                        target=record["target"],
+                        weight=record.get("weight", 1.0),
+                        relation_type=record.get("relation_type", "prerequisite"),
+                        metadata=record.get("metadata", {})
+                    ))
+                    if len(edges) >= batch_size:
+                        flush_edges()
+
+            if nodes:
+                flush_nodes()
+            if edges:
+                flush_edges()
+        except (ValueError, KeyError, TypeError) as e:
+            reason = f"缺少字段 {e}" if isinstance(e, KeyError) else str(e)
+            raise GraphImportError(f"第 {index} 条记录附近出错: {reason}", counts) from e
+        return counts
+
 
 class BaseVectorStorage(ABC):
     """向量存储抽象基类"""
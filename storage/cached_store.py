@@ -0,0 +1,425 @@
+# storage/cached_store.py
+"""
+节点读缓存 - 包在任意 BaseGraphStorage 外层的有界 LRU
+
+同一轮对话中工具会反复读取相同节点（query_node 先 get_node 再 get_prerequisites，
+路径类工具逐步 get_node），缓存这些点查可以省去重复的 SQL 与 JSON 解码。
+本进程内的写操作精确失效相关条目；其他进程的写入通过 data_version() 检测，变化时整体清空。
+"""
+
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import replace
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+from .base import (
+    BaseGraphStorage,
+    Change,
+    KnowledgeNode,
+    KnowledgeEdge,
+    NodeRow,
+    Problem,
+    Subgraph,
+    check_node_fields
+)
+from .compact_graph import CompactGraph
+
+_MISSING = object()
+
+
+class CachedGraphStore(BaseGraphStorage):
+    """带读缓存的图存储包装
+
+    缓存 get_node / get_prerequisites / get_dependents（以及 get_nodes 的命中部分），
+    其余方法原样转发给内层存储。返回的对象均为副本，修改后需调用 update_node 才会生效。
+    transaction() 内的读取直接走内层存储，避免把未提交的数据放进缓存。
+    """
+
+    def __init__(self, store: BaseGraphStorage, max_entries: int = 1024):
+        self.store = store
+        self.max_entries = max_entries
+        self._cache: "OrderedDict[Tuple[str, str], Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        # 每次失效递增；读取前后代数不同说明期间有写入，结果不再放入缓存
+        self._generation = 0
+        self._data_version = store.data_version()
+        self.hits = 0
+        self.misses = 0
+
+    def __getattr__(self, name: str) -> Any:
+        # 内层存储特有的方法（如 subscribe、prune_changes、rebuild_closure）直接转发
+        return getattr(self.store, name)
+
+    # 缓存维护
+    def _in_transaction(self) -> bool:
+        return getattr(self._local, "depth", 0) > 0
+
+    def _check_external(self):
+        """其他进程提交过写入时清空整个缓存"""
+        version = self.store.data_version()
+        if version is None or version == self._data_version:
+            return
+        with self._lock:
+            self._data_version = version
+            self._cache.clear()
+            self._generation += 1
+
+    def _lookup(self, key: Tuple[str, str]) -> Any:
+        with self._lock:
+            value = self._cache.get(key, _MISSING)
+            if value is _MISSING:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._cache.move_to_end(key)
+            return value
+
+    def _store(self, key: Tuple[str, str], value: Any, generation: int):
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._cache[key] = value
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    def _cached(self, kind: str, node_id: str, load: Callable[[str], Any]) -> Any:
+        """读穿缓存：命中直接返回，未命中调用 load 并在期间无写入时写回"""
+        if self._in_transaction():
+            return load(node_id)
+        self._check_external()
+        key = (kind, node_id)
+        value = self._lookup(key)
+        if value is _MISSING:
+            generation = self._generation
+            value = load(node_id)
+            self._store(key, value, generation)
+        return value
+
+    def _invalidate(self, node_ids: Iterable[str] = (), prerequisites: Iterable[str] = (),
+                    dependents: Iterable[str] = ()):
+        """失效指定条目；事务中的失效在结束时再执行一次，覆盖其他线程期间读入的旧值"""
+        keys = [("node", node_id) for node_id in node_ids]
+        keys += [("prereq", node_id) for node_id in prerequisites]
+        keys += [("dep", node_id) for node_id in dependents]
+        self._drop(keys)
+        if self._in_transaction():
+            self._local.dirty.update(keys)
+
+    def _drop(self, keys: Iterable[Tuple[str, str]]):
+        with self._lock:
+            for key in keys:
+                self._cache.pop(key, None)
+            self._generation += 1
+
+    def clear_cache(self):
+        """清空缓存（事务中调用时，结束后再清空一次）"""
+        with self._lock:
+            self._cache.clear()
+            self._generation += 1
+        if self._in_transaction():
+            self._local.clear_all = True
+
+    def _after_write(self):
+        """本进程提交后同步 data_version，避免把自己的写入当作外部写入而清空缓存
+
+        只有内层存储确认版本变化恰好来自本次提交（提交前的版本与缓存记录一致、提交后期间无其他写入）
+        时才直接采用新版本，否则整体清空，不吸收其他连接在提交前后夹带的写入。
+        """
+        if self._in_transaction():
+            return
+        version = self.store.data_version()
+        if version is None or version == self._data_version:
+            return
+        versions = self.store.last_commit_versions()
+        with self._lock:
+            if versions != (self._data_version, version):
+                self._cache.clear()
+                self._generation += 1
+            self._data_version = version
+
+    # 事务
+    @contextmanager
+    def transaction(self):
+        """工作单元（转发给内层存储），结束时（提交或回滚后）再次失效期间写过的条目"""
+        local = self._local
+        if getattr(local, "depth", 0) == 0:
+            self._check_external()
+            local.dirty = set()
+            local.clear_all = False
+        local.depth = getattr(local, "depth", 0) + 1
+        try:
+            with self.store.transaction():
+                yield self
+        finally:
+            local.depth -= 1
+            if local.depth == 0:
+                dirty, local.dirty = local.dirty, set()
+                if local.clear_all:
+                    self.clear_cache()
+                elif dirty:
+                    self._drop(dirty)
+                self._after_write()
+
+    def call_after_commit(self, callback: Callable, *args, **kwargs):
+        self.store.call_after_commit(callback, *args, **kwargs)
+
+    def close(self):
+        self.clear_cache()
+        self.store.close()
+
+    def data_version(self) -> Optional[int]:
+        return self.store.data_version()
+
+    def last_commit_versions(self) -> Optional[Tuple[int, Optional[int]]]:
+        return self.store.last_commit_versions()
+
+    # 节点
+    def add_node(self, node: KnowledgeNode) -> str:
+        self._check_external()
+        try:
+            return self.store.add_node(node)
+        finally:
+            self._invalidate(node_ids=[node.id])
+            self._after_write()
+
+    def add_nodes(self, nodes: List[KnowledgeNode]) -> int:
+        nodes = list(nodes)
+        self._check_external()
+        try:
+            return self.store.add_nodes(nodes)
+        finally:
+            self._invalidate(node_ids=[node.id for node in nodes])
+            self._after_write()
+
+    def get_node(self, node_id: str) -> Optional[KnowledgeNode]:
+        node = self._cached("node", node_id, self.store.get_node)
+        return _clone_node(node) if node else None
+
+    def get_nodes(
+            self,
+            node_ids: List[str],
+            fields: Optional[Sequence[str]] = None
+    ) -> Dict[str, Union[KnowledgeNode, NodeRow]]:
+        """批量获取节点：缓存命中的直接返回，其余一次性从内层存储读取"""
+        if self._in_transaction():
+            return self.store.get_nodes(node_ids, fields=fields)
+        if fields is not None:
+            check_node_fields(fields)
+        self._check_external()
+
+        found: Dict[str, KnowledgeNode] = {}
+        missing = []
+        for node_id in dict.fromkeys(node_ids):
+            node = self._lookup(("node", node_id))
+            if node is _MISSING:
+                missing.append(node_id)
+            elif node is not None:
+                found[node_id] = node
+
+        loaded = {}
+        if missing:
+            generation = self._generation
+            loaded = self.store.get_nodes(missing, fields=fields)
+            if fields is None:
+                for node_id in missing:
+                    self._store(("node", node_id), loaded.get(node_id), generation)
+
+        nodes = {}
+        for node_id in dict.fromkeys(node_ids):
+            if node_id in found:
+                node = found[node_id]
+                nodes[node_id] = _clone_node(node) if fields is None else NodeRow.from_node(node)
+            elif node_id in loaded:
+                node = loaded[node_id]
+                nodes[node_id] = _clone_node(node) if fields is None else node
+        return nodes
+
+    def update_node(self, node: KnowledgeNode) -> bool:
+        self._check_external()
+        try:
+            return self.store.update_node(node)
+        finally:
+            self._invalidate(node_ids=[node.id])
+            self._after_write()
+
+    def delete_node(self, node_id: str) -> bool:
+        # 删除会级联删除相关边，相邻节点的前置/后续列表随之变化
+        self._check_external()
+        prerequisites = self.store.get_prerequisites(node_id)
+        dependents = self.store.get_dependents(node_id)
+        try:
+            return self.store.delete_node(node_id)
+        finally:
+            self._invalidate(
+                node_ids=[node_id],
+                prerequisites=[node_id] + dependents,
+                dependents=[node_id] + prerequisites
+            )
+            self._after_write()
+
+    def merge_nodes(self, source_id: str, target_id: str) -> bool:
+        # source 的邻居改接到 target，双方及这些邻居的前置/后续列表都会变化
+        self._check_external()
+        neighbors = (
+            self.store.get_prerequisites(source_id) + self.store.get_dependents(source_id)
+            + [source_id, target_id]
+        )
+        try:
+            return self.store.merge_nodes(source_id, target_id)
+        finally:
+            self._invalidate(node_ids=[source_id, target_id], prerequisites=neighbors, dependents=neighbors)
+            self._after_write()
+
+    def clear(self) -> int:
+        self._check_external()
+        try:
+            return self.store.clear()
+        finally:
+            self.clear_cache()
+            self._after_write()
+
+    # 边
+    def add_edge(self, edge: KnowledgeEdge) -> bool:
+        self._check_external()
+        try:
+            return self.store.add_edge(edge)
+        finally:
+            self._invalidate(prerequisites=[edge.target], dependents=[edge.source])
+            self._after_write()
+
+    def add_edges(self, edges: List[KnowledgeEdge]) -> int:
+        edges = list(edges)
+        self._check_external()
+        try:
+            return self.store.add_edges(edges)
+        finally:
+            self._invalidate(
+                prerequisites=[edge.target for edge in edges],
+                dependents=[edge.source for edge in edges]
+            )
+            self._after_write()
+
+    def get_prerequisites(self, node_id: str) -> List[str]:
+        return list(self._cached("prereq", node_id, self.store.get_prerequisites))
+
+    def get_dependents(self, node_id: str) -> List[str]:
+        return list(self._cached("dep", node_id, self.store.get_dependents))
+
+    # 以下方法不经过缓存，显式转发以使用内层存储的实现而不是基类默认实现
+    def is_prerequisite(self, ancestor: str, descendant: str) -> bool:
+        return self.store.is_prerequisite(ancestor, descendant)
+
+    def get_all_nodes(self, fields: Optional[Sequence[str]] = None) -> List[Union[KnowledgeNode, NodeRow]]:
+        return self.store.get_all_nodes(fields=fields)
+
+    def get_all_edges(self) -> List[KnowledgeEdge]:
+        return self.store.get_all_edges()
+
+    def iter_nodes(
+            self,
+            batch_size: int = 500,
+            after: Optional[str] = None,
+            fields: Optional[Sequence[str]] = None
+    ) -> Iterator[Union[KnowledgeNode, NodeRow]]:
+        return self.store.iter_nodes(batch_size=batch_size, after=after, fields=fields)
+
+    def iter_edges(
+            self,
+            batch_size: int = 500,
+            after: Optional[Tuple[str, str]] = None
+    ) -> Iterator[KnowledgeEdge]:
+        return self.store.iter_edges(batch_size=batch_size, after=after)
+
+    def get_compact_graph(self) -> CompactGraph:
+        return self.store.get_compact_graph()
+
+    def node_exists(self, node_id: str) -> bool:
+        return self.store.node_exists(node_id)
+
+    def find_by_alias(self, alias: str) -> Optional[str]:
+        return self.store.find_by_alias(alias)
+
+    def search_lexical(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
+        return self.store.search_lexical(query, top_k=top_k)
+
+    def find_by_text(self, query: str, min_coverage: float = 0.75) -> Optional[str]:
+        return self.store.find_by_text(query, min_coverage=min_coverage)
+
+    def get_learning_path(self, target_node: str) -> List[str]:
+        return self.store.get_learning_path(target_node)
+
+    def get_subgraph(
+            self,
+            seeds: Sequence[str],
+            max_hops: int = 2,
+            max_nodes: int = 30,
+            direction: str = "up",
+            min_weight: float = 0.0
+    ) -> Subgraph:
+        return self.store.get_subgraph(
+            seeds, max_hops=max_hops, max_nodes=max_nodes, direction=direction, min_weight=min_weight
+        )
+
+    # 题目不进缓存，但写入同样要同步 data_version
+    def add_problem(self, problem: Problem) -> int:
+        self._check_external()
+        try:
+            return self.store.add_problem(problem)
+        finally:
+            self._after_write()
+
+    def add_problems(self, problems: List[Problem]) -> List[int]:
+        self._check_external()
+        try:
+            return self.store.add_problems(problems)
+        finally:
+            self._after_write()
+
+    def get_problems_by_node(self, node_id: str) -> List[Problem]:
+        return self.store.get_problems_by_node(node_id)
+
+    def get_statistics(self) -> Dict[str, Any]:
+        return self.store.get_statistics()
+
+    def get_changes(self, since_seq: int = 0, limit: int = 1000) -> List[Change]:
+        return self.store.get_changes(since_seq=since_seq, limit=limit)
+
+    def latest_change_seq(self) -> int:
+        return self.store.latest_change_seq()
+
+    # 导入导出：导入可能改动任意节点，完成后清空缓存
+    def export_to_json(self, filepath: str, ndjson: Optional[bool] = None) -> Dict[str, int]:
+        return self.store.export_to_json(filepath, ndjson=ndjson)
+
+    def import_from_json(
+            self,
+            filepath: str,
+            batch_size: int = 500,
+            on_nodes: Optional[Callable[[List[KnowledgeNode]], None]] = None
+    ) -> Dict[str, int]:
+        self._check_external()
+        try:
+            return self.store.import_from_json(filepath, batch_size=batch_size, on_nodes=on_nodes)
+        finally:
+            self.clear_cache()
+            self._after_write()
+
+    def import_ndjson(
+            self,
+            filepath: str,
+            batch_size: int = 500,
+            on_nodes: Optional[Callable[[List[KnowledgeNode]], None]] = None
+    ) -> Dict[str, int]:
+        self._check_external()
+        try:
+            return self.store.import_ndjson(filepath, batch_size=batch_size, on_nodes=on_nodes)
+        finally:
+            self.clear_cache()
+            self._after_write()
+
+
+def _clone_node(node: KnowledgeNode) -> KnowledgeNode:
+    return replace(node, aliases=list(node.aliases), metadata=dict(node.metadata))
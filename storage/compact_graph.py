@@ -0,0 +1,175 @@
+# storage/compact_graph.py
+"""
+紧凑只读图视图 - 节点 ID 驻留为整数下标，邻接用 CSR 数组存储
+
+百万条边的图只占用几十 MB（每条边正反两份 int32 下标 + 一份 float32 权重），
+适合全图分析类查询；数组支持缓冲区协议，可直接交给 numpy.frombuffer 零拷贝使用。
+"""
+
+from array import array
+from collections import deque
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+
+class NodeRecord:
+    """紧凑图中的节点记录"""
+    __slots__ = ("id", "difficulty", "proficiency")
+
+    def __init__(self, id: str, difficulty: int, proficiency: float):
+        self.id = id
+        self.difficulty = difficulty
+        self.proficiency = proficiency
+
+    def __repr__(self) -> str:
+        return f"NodeRecord(id={self.id!r}, difficulty={self.difficulty}, proficiency={self.proficiency})"
+
+
+class CompactGraph:
+    """只读 CSR 图"""
+
+    def __init__(self):
+        self.ids: List[str] = []
+        self.index: Dict[str, int] = {}
+        self.difficulty = array("b")
+        self.proficiency = array("f")
+        self.out_offsets = array("i", [0])
+        self.out_targets = array("i")
+        self.out_weights = array("f")
+        self.in_offsets = array("i", [0])
+        self.in_sources = array("i")
+
+    @classmethod
+    def build(
+            cls,
+            nodes: Iterable[Tuple[str, int, float]],
+            edges: Iterable[Tuple[str, str, float]]
+    ) -> "CompactGraph":
+        """由 (id, difficulty, proficiency) 与 (source, target, weight) 流构建"""
+        graph = cls()
+        for node_id, difficulty, proficiency in nodes:
+            graph._intern(node_id, difficulty, proficiency)
+
+        sources, targets, weights = array("i"), array("i"), array("f")
+        for source, target, weight in edges:
+            sources.append(graph._intern(source))
+            targets.append(graph._intern(target))
+            weights.append(weight)
+
+        graph.out_offsets, order = cls._csr(len(graph.ids), sources)
+        graph.out_targets = array("i", (targets[i] for i in order))
+        graph.out_weights = array("f", (weights[i] for i in order))
+
+        graph.in_offsets, order = cls._csr(len(graph.ids), targets)
+        graph.in_sources = array("i", (sources[i] for i in order))
+        return graph
+
+    def _intern(self, node_id: str, difficulty: int = 1, proficiency: float = 0.0) -> int:
+        idx = self.index.get(node_id)
+        if idx is None:
+            idx = len(self.ids)
+            self.index[node_id] = idx
+            self.ids.append(node_id)
+            self.difficulty.append(max(-128, min(127, int(difficulty))))
+            self.proficiency.append(proficiency)
+        return idx
+
+    @staticmethod
+    def _csr(size: int, keys: array) -> Tuple[array, array]:
+        """计数排序：返回 (offsets, 边序号按 key 分组后的排列)"""
+        offsets = array("i", [0]) * (size + 1)
+        for key in keys:
+            offsets[key + 1] += 1
+        for i in range(size):
+            offsets[i + 1] += offsets[i]
+
+        cursor = array("i", offsets[:-1]) if size else array("i")
+        order = array("i", [0]) * len(keys)
+        for edge_idx, key in enumerate(keys):
+            order[cursor[key]] = edge_idx
+            cursor[key] += 1
+        return offsets, order
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, node_id: str) -> bool:
+        return node_id in self.index
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.out_targets)
+
+    @property
+    def nbytes(self) -> int:
+        """数组部分占用的字节数（不含节点 ID 字符串）"""
+        buffers = (
+            self.difficulty, self.proficiency,
+            self.out_offsets, self.out_targets, self.out_weights,
+            self.in_offsets, self.in_sources,
+        )
+        return sum(len(buf) * buf.itemsize for buf in buffers)
+
+    def node(self, node_id: str) -> Optional[NodeRecord]:
+        idx = self.index.get(node_id)
+        if idx is None:
+            return None
+        return NodeRecord(self.ids[idx], self.difficulty[idx], self.proficiency[idx])
+
+    def out_degree(self, node_id: str) -> int:
+        idx = self.index[node_id]
+        return self.out_offsets[idx + 1] - self.out_offsets[idx]
+
+    def in_degree(self, node_id: str) -> int:
+        idx = self.index[node_id]
+        return self.in_offsets[idx + 1] - self.in_offsets[idx]
+
+    def successors(self, node_id: str) -> List[str]:
+        idx = self.index[node_id]
+        return [self.ids[t] for t in self.out_targets[self.out_offsets[idx]:self.out_offsets[idx + 1]]]
+
+    def predecessors(self, node_id: str) -> List[str]:
+        idx = self.index[node_id]
+        return [self.ids[s] for s in self.in_sources[self.in_offsets[idx]:self.in_offsets[idx + 1]]]
+
+    def roots(self) -> List[str]:
+        """无前置的节点"""
+        return [
+            self.ids[i] for i in range(len(self.ids))
+            if self.in_offsets[i] == self.in_offsets[i + 1]
+        ]
+
+    def leaves(self) -> List[str]:
+        """无后续的节点"""
+        return [
+            self.ids[i] for i in range(len(self.ids))
+            if self.out_offsets[i] == self.out_offsets[i + 1]
+        ]
+
+    def ancestors(self, node_id: str) -> Set[str]:
+        return self._reachable(node_id, self.in_offsets, self.in_sources)
+
+    def descendants(self, node_id: str) -> Set[str]:
+        return self._reachable(node_id, self.out_offsets, self.out_targets)
+
+    def _reachable(self, node_id: str, offsets: array, neighbors: array) -> Set[str]:
+        start = self.index.get(node_id)
+        if start is None:
+            return set()
+        seen = bytearray(len(self.ids))
+        seen[start] = 1
+        queue = deque([start])
+        found = []
+        while queue:
+            idx = queue.popleft()
+            for neighbor in neighbors[offsets[idx]:offsets[idx + 1]]:
+                if not seen[neighbor]:
+                    seen[neighbor] = 1
+                    found.append(neighbor)
+                    queue.append(neighbor)
+        return {self.ids[i] for i in found}
+
+    def edges(self) -> Iterator[Tuple[str, str, float]]:
+        """按源节点分组遍历所有边"""
+        for source in range(len(self.ids)):
+            for pos in range(self.out_offsets[source], self.out_offsets[source + 1]):
+                yield self.ids[source], self.ids[self.out_targets[pos]], self.out_weights[pos]
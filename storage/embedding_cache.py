@@ -0,0 +1,92 @@
+# storage/embedding_cache.py
+"""
+嵌入向量的磁盘缓存 - 按 (模型, sha256(文本)) 存 float32 BLOB
+
+进程重启或重建向量索引时，未变化的文本无需再次调用 embedding 接口。
+"""
+
+import hashlib
+import sqlite3
+import threading
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+def text_hash(text: str) -> bytes:
+    return hashlib.sha256(text.encode("utf-8")).digest()
+
+
+class EmbeddingCache:
+    """SQLite 持久化的嵌入缓存（多线程共享一条连接，多进程通过 WAL 并发读）"""
+
+    def __init__(self, db_path: str = "embedding_cache.db", busy_timeout: float = 5.0):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=busy_timeout, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                text_hash BLOB NOT NULL,
+                dim INTEGER NOT NULL,
+                vector BLOB NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (model, text_hash)
+            ) WITHOUT ROWID
+        ''')
+        self._conn.commit()
+
+    @staticmethod
+    def _decode(blob: bytes) -> List[float]:
+        vector = array("f")
+        vector.frombytes(blob)
+        return vector.tolist()
+
+    def get(self, model: str, text: str) -> Optional[List[float]]:
+        """读取单条缓存，未命中返回 None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT vector FROM embeddings WHERE model = ? AND text_hash = ?",
+                (model, text_hash(text))
+            ).fetchone()
+        return self._decode(row[0]) if row else None
+
+    def get_many(self, model: str, texts: Iterable[str]) -> Dict[str, List[float]]:
+        """批量读取，只返回命中的文本"""
+        hashes = {text_hash(text): text for text in texts}
+        found = {}
+        keys = list(hashes)
+        with self._lock:
+            # 分块避免超过 SQLite 的变量数上限
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                for digest, blob in self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model] + chunk
+                ):
+                    found[hashes[digest]] = self._decode(blob)
+        return found
+
+    def put_many(self, model: str, items: Iterable[Tuple[str, List[float]]]):
+        """写入 (文本, 向量)，已存在的覆盖"""
+        rows = [
+            (model, text_hash(text), len(embedding), array("f", embedding).tobytes())
+            for text, embedding in items
+        ]
+        if not rows:
+            return
+        with self._lock:
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (model, text_hash, dim, vector) VALUES (?, ?, ?, ?)",
+                    rows
+                )
+
+    def put(self, model: str, text: str, embedding: List[float]):
+        self.put_many(model, [(text, embedding)])
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,102 @@
+# storage/json_stream.py
+"""
+流式 JSON 读取 - 导入大文件时不把整个文件读入内存
+"""
+
+import json
+from typing import Any, Dict, IO, Iterator, Tuple
+
+
+class _JsonStream:
+    """基于 raw_decode 的分块读取器"""
+
+    def __init__(self, fp: IO[str], chunk_size: int):
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buf = ""
+        self.pos = 0
+        self.offset = 0  # buf[0] 在文件中的字符位置，用于报错
+        self.eof = False
+
+    def _fill(self) -> bool:
+        chunk = self.fp.read(self.chunk_size)
+        self.offset += self.pos
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        if not chunk:
+            self.eof = True
+        return bool(chunk)
+
+    def peek(self) -> str:
+        """跳过空白，返回下一个字符（文件结束返回空串）"""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, char: str):
+        if self.peek() != char:
+            raise ValueError(f"JSON 格式错误: 位置 {self.offset + self.pos} 处期望 {char!r}")
+        self.pos += 1
+
+    def value(self) -> Any:
+        """解码下一个完整的 JSON 值，缓冲区不足时继续读取"""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+                # 值恰好结束在缓冲区末尾时可能被截断（如数字），需再读一块确认
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError as e:
+                if self.eof:
+                    raise ValueError(f"JSON 格式错误: 位置 {self.offset + e.pos} 处: {e.msg}") from e
+            self._fill()
+
+
+def iter_json_arrays(fp: IO[str], chunk_size: int = 1 << 16) -> Iterator[Tuple[str, Any]]:
+    """流式解析顶层 JSON 对象，逐个产出 (key, 数组元素)；非数组的值会被跳过"""
+    stream = _JsonStream(fp, chunk_size)
+    stream.expect("{")
+    if stream.peek() == "}":
+        return
+
+    while True:
+        key = stream.value()
+        stream.expect(":")
+        if stream.peek() == "[":
+            stream.pos += 1
+            if stream.peek() == "]":
+                stream.pos += 1
+            else:
+                while True:
+                    yield key, stream.value()
+                    if stream.peek() == ",":
+                        stream.pos += 1
+                        continue
+                    stream.expect("]")
+                    break
+        else:
+            stream.value()
+
+        if stream.peek() == ",":
+            stream.pos += 1
+            continue
+        stream.expect("}")
+        return
+
+
+def iter_ndjson(fp: IO[str]) -> Iterator[Dict[str, Any]]:
+    """逐行解析 NDJSON，跳过空行"""
+    for lineno, line in enumerate(fp, 1):
+        line = line.strip()
+        if line:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"NDJSON 格式错误: 第 {lineno} 行第 {e.colno} 列: {e.msg}") from e
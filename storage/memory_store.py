@@ -0,0 +1,424 @@
+# storage/memory_store.py
+"""
+内存图存储实现 - 字典 + 邻接表，可原子地快照到磁盘
+
+适合对延迟敏感的临时会话，以及测试/基准运行。
+"""
+
+import json
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from dataclasses import replace
+from typing import Dict, List, Optional, Any, Tuple, Callable, Sequence, Union
+
+from .adjacency import AdjacencyIndex
+from .base import (
+    BaseGraphStorage,
+    KnowledgeNode,
+    KnowledgeEdge,
+    NodeRow,
+    Problem,
+    check_node_fields,
+    proficiency_bucket
+)
+
+_MISSING = object()
+SNAPSHOT_VERSION = 1
+
+
+class MemoryGraphStore(BaseGraphStorage):
+    """内存图存储
+
+    节点、边、题目保存在字典中，写操作记录撤销日志，transaction() 异常时整体回滚；
+    返回给调用方的对象均为副本，修改后需调用 update_node 才会生效。
+    snapshot_path 非空时，构造时从快照加载，close() 时写回快照。
+    """
+
+    def __init__(self, snapshot_path: Optional[str] = None):
+        self.snapshot_path = snapshot_path
+        self._lock = threading.RLock()
+        self._journal: Optional[List[Tuple[Dict, Any, Any]]] = None
+        self._after_commit: List[Tuple[Callable, tuple, dict]] = []
+
+        self._nodes: Dict[str, KnowledgeNode] = {}
+        self._edges: Dict[Tuple[str, str], KnowledgeEdge] = {}
+        self._problems: Dict[int, Problem] = {}
+        self._meta: Dict[str, int] = {"next_problem_id": 1}
+        self._rebuild_indexes()
+
+        if snapshot_path and os.path.exists(snapshot_path):
+            self.load_snapshot(snapshot_path)
+
+    # 事务与撤销日志
+    @contextmanager
+    def transaction(self):
+        """单元事务：退出时提交并执行 call_after_commit 回调，异常时按撤销日志回滚"""
+        with self._lock:
+            if self._journal is not None:
+                yield self
+                return
+
+            self._journal = []
+            try:
+                yield self
+            except BaseException:
+                self._rollback()
+                raise
+            finally:
+                self._journal = None
+            callbacks, self._after_commit = self._after_commit, []
+
+        for callback, args, kwargs in callbacks:
+            callback(*args, **kwargs)
+
+    def call_after_commit(self, callback: Callable, *args, **kwargs):
+        """在事务中时延迟到提交后执行，否则立即执行"""
+        with self._lock:
+            if self._journal is not None:
+                self._after_commit.append((callback, args, kwargs))
+                return
+        callback(*args, **kwargs)
+
+    def _set(self, table: Dict, key: Any, value: Any):
+        if self._journal is not None:
+            self._journal.append((table, key, table.get(key, _MISSING)))
+        table[key] = value
+
+    def _pop(self, table: Dict, key: Any) -> Any:
+        if key not in table:
+            return None
+        if self._journal is not None:
+            self._journal.append((table, key, table[key]))
+        return table.pop(key)
+
+    def _rollback(self):
+        for table, key, old in reversed(self._journal):
+            if old is _MISSING:
+                table.pop(key, None)
+            else:
+                table[key] = old
+        self._after_commit = []
+        self._rebuild_indexes()
+
+    def _rebuild_indexes(self):
+        """由节点/边/题目字典重建邻接表、别名索引和题目索引"""
+        self._adjacency = AdjacencyIndex.from_edges(
+            (source, target, edge.weight) for (source, target), edge in self._edges.items()
+        )
+        self._aliases: Dict[str, Dict[str, bool]] = {}  # alias_key -> {node_id: is_primary}
+        for node in self._nodes.values():
+            self._index_aliases(node)
+        self._problem_index: Dict[str, List[int]] = {}
+        for problem_id in sorted(self._problems):
+            self._index_problem(self._problems[problem_id])
+
+    def _index_aliases(self, node: KnowledgeNode):
+        primary_key = node.id.lower()
+        self._aliases.setdefault(primary_key, {})[node.id] = True
+        for key in {alias.lower() for alias in node.aliases} - {primary_key}:
+            self._aliases.setdefault(key, {})[node.id] = False
+
+    def _unindex_aliases(self, node: KnowledgeNode):
+        for key in {node.id.lower()} | {alias.lower() for alias in node.aliases}:
+            entries = self._aliases.get(key)
+            if entries is not None:
+                entries.pop(node.id, None)
+                if not entries:
+                    del self._aliases[key]
+
+    def _index_problem(self, problem: Problem):
+        for node_id in dict.fromkeys(problem.linked_nodes):
+            self._problem_index.setdefault(node_id, []).append(problem.id)
+
+    @staticmethod
+    def _clone_node(node: KnowledgeNode) -> KnowledgeNode:
+        return replace(node, aliases=list(node.aliases), metadata=dict(node.metadata))
+
+    @staticmethod
+    def _clone_edge(edge: KnowledgeEdge) -> KnowledgeEdge:
+        return replace(edge, metadata=dict(edge.metadata))
+
+    @staticmethod
+    def _clone_problem(problem: Problem) -> Problem:
+        return replace(problem, linked_nodes=list(problem.linked_nodes))
+
+    # 节点
+    def _put_node(self, node: KnowledgeNode):
+        old = self._nodes.get(node.id)
+        if old is not None:
+            self._unindex_aliases(old)
+        self._set(self._nodes, node.id, self._clone_node(node))
+        self._index_aliases(node)
+
+    def add_node(self, node: KnowledgeNode) -> str:
+        """添加或更新节点"""
+        with self._lock:
+            self._put_node(node)
+        return node.id
+
+    def add_nodes(self, nodes: List[KnowledgeNode]) -> int:
+        """批量添加或更新节点"""
+        nodes = list(nodes)
+        with self.transaction():
+            for node in nodes:
+                self._put_node(node)
+        return len(nodes)
+
+    def get_node(self, node_id: str) -> Optional[KnowledgeNode]:
+        """获取节点"""
+        with self._lock:
+            node = self._nodes.get(node_id)
+            return self._clone_node(node) if node else None
+
+    def get_nodes(
+            self,
+            node_ids: List[str],
+            fields: Optional[Sequence[str]] = None
+    ) -> Dict[str, Union[KnowledgeNode, NodeRow]]:
+        """批量获取节点，缺失的 ID 不出现在结果中"""
+        if fields is not None:
+            check_node_fields(fields)
+        with self._lock:
+            return {
+                node_id: self._clone_node(node) if fields is None else NodeRow.from_node(node)
+                for node_id in node_ids
+                for node in (self._nodes.get(node_id),)
+                if node is not None
+            }
+
+    def update_node(self, node: KnowledgeNode) -> bool:
+        """更新节点"""
+        with self._lock:
+            if node.id not in self._nodes:
+                return False
+            self._put_node(node)
+            return True
+
+    def delete_node(self, node_id: str) -> bool:
+        """删除节点及相关边"""
+        with self._lock:
+            for target in list(self._adjacency.successors(node_id)):
+                self._pop(self._edges, (node_id, target))
+            for source in list(self._adjacency.predecessors(node_id)):
+                self._pop(self._edges, (source, node_id))
+            self._adjacency.remove_node(node_id)
+
+            node = self._pop(self._nodes, node_id)
+            if node is None:
+                return False
+            self._unindex_aliases(node)
+            return True
+
+    def clear(self) -> int:
+        """删除全部节点和边（题目保留），返回删除的节点数"""
+        with self._lock:
+            count = len(self._nodes)
+            for key in list(self._edges):
+                self._pop(self._edges, key)
+            for key in list(self._nodes):
+                self._pop(self._nodes, key)
+            self._adjacency = AdjacencyIndex()
+            self._aliases = {}
+            return count
+
+    # 边
+    def add_edge(self, edge: KnowledgeEdge) -> bool:
+        """添加边（会形成环时抛出 ValueError）"""
+        return self.add_edges([edge]) == 1
+
+    def add_edges(self, edges: List[KnowledgeEdge]) -> int:
+        """批量添加边（任一条边成环则整体回滚）"""
+        edges = list(edges)
+        with self.transaction():
+            for edge in edges:
+                if edge.source == edge.target or edge.source in self._adjacency.descendants(edge.target):
+                    raise ValueError(f"依赖 {edge.source} → {edge.target} 会形成环")
+                self._set(self._edges, (edge.source, edge.target), self._clone_edge(edge))
+                self._adjacency.add_edge(edge.source, edge.target, edge.weight)
+        return len(edges)
+
+    def _neighbor_edges(self, node_ids: List[str], direction: str) -> List[Tuple[str, str, float]]:
+        with self._lock:
+            if direction == "up":
+                return [
+                    (source, node_id, weight)
+                    for node_id in node_ids
+                    for source, weight in self._adjacency.predecessors(node_id).items()
+                ]
+            return [
+                (node_id, target, weight)
+                for node_id in node_ids
+                for target, weight in self._adjacency.successors(node_id).items()
+            ]
+
+    def get_prerequisites(self, node_id: str) -> List[str]:
+        """获取前置知识"""
+        with self._lock:
+            return list(self._adjacency.predecessors(node_id))
+
+    def get_dependents(self, node_id: str) -> List[str]:
+        """获取后续知识"""
+        with self._lock:
+            return list(self._adjacency.successors(node_id))
+
+    def is_prerequisite(self, ancestor: str, descendant: str) -> bool:
+        """ancestor 是否为 descendant 的（直接或间接）前置知识"""
+        with self._lock:
+            return ancestor in self._adjacency.ancestors(descendant)
+
+    def get_all_nodes(self, fields: Optional[Sequence[str]] = None) -> List[Union[KnowledgeNode, NodeRow]]:
+        """获取所有节点（按 ID 排序）"""
+        if fields is not None:
+            check_node_fields(fields)
+        with self._lock:
+            nodes = [self._nodes[node_id] for node_id in sorted(self._nodes)]
+        if fields is None:
+            return [self._clone_node(node) for node in nodes]
+        return [NodeRow.from_node(node) for node in nodes]
+
+    def get_all_edges(self) -> List[KnowledgeEdge]:
+        """获取所有边"""
+        with self._lock:
+            return [self._clone_edge(edge) for edge in self._edges.values()]
+
+    # 查询
+    def find_by_alias(self, alias: str) -> Optional[str]:
+        """通过别名查找节点（大小写不敏感，优先匹配节点 ID）"""
+        with self._lock:
+            entries = self._aliases.get(alias.lower())
+            if not entries:
+                return None
+            primary = [node_id for node_id, is_primary in entries.items() if is_primary]
+            return min(primary or entries)
+
+    def get_learning_path(self, target_node: str) -> List[str]:
+        """获取学习路径：全部前置知识按拓扑序排列，最后是目标本身"""
+        with self._lock:
+            ancestors = self._adjacency.ancestors(target_node)
+            return self._adjacency.topological_sort(ancestors, strict=False) + [target_node]
+
+    # 题目
+    def add_problems(self, problems: List[Problem]) -> List[int]:
+        """批量添加题目，返回新题目 ID"""
+        problem_ids = []
+        with self.transaction():
+            for problem in problems:
+                problem_id = self._meta["next_problem_id"]
+                self._set(self._meta, "next_problem_id", problem_id + 1)
+                stored = replace(self._clone_problem(problem), id=problem_id)
+                self._set(self._problems, problem_id, stored)
+                self._index_problem(stored)
+                problem_ids.append(problem_id)
+        return problem_ids
+
+    def _relink_problems(self, source_id: str, target_id: str):
+        """把关联 source 的题目改挂到 target，linked_nodes 去重并保持顺序（与 SQLite 后端一致）"""
+        with self._lock:
+            problem_ids = self._problem_index.pop(source_id, [])
+            for problem_id in problem_ids:
+                problem = self._problems.get(problem_id)
+                if problem is None:
+                    continue
+                linked_nodes = list(dict.fromkeys(
+                    target_id if node_id == source_id else node_id for node_id in problem.linked_nodes
+                ))
+                self._set(self._problems, problem_id, replace(problem, linked_nodes=linked_nodes))
+            if problem_ids:
+                self._problem_index[target_id] = sorted(
+                    set(self._problem_index.get(target_id, [])) | set(problem_ids)
+                )
+
+    def get_problems_by_node(self, node_id: str) -> List[Problem]:
+        """获取节点相关的题目"""
+        with self._lock:
+            return [
+                self._clone_problem(self._problems[problem_id])
+                for problem_id in self._problem_index.get(node_id, [])
+                if problem_id in self._problems
+            ]
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """获取统计信息"""
+        buckets = {"未学习": 0, "学习中": 0, "已掌握": 0}
+        with self._lock:
+            for node in self._nodes.values():
+                buckets[proficiency_bucket(node.proficiency)] += 1
+            return {
+                "node_count": len(self._nodes),
+                "edge_count": len(self._edges),
+                "problem_count": len(self._problems),
+                "proficiency_distribution": buckets,
+            }
+
+    # 快照
+    def save_snapshot(self, path: Optional[str] = None) -> str:
+        """写入快照：先写同目录临时文件再 os.replace，中途崩溃不会留下半个快照"""
+        path = path or self.snapshot_path
+        if not path:
+            raise ValueError("未指定快照路径")
+
+        with self._lock:
+            data = {
+                "version": SNAPSHOT_VERSION,
+                "next_problem_id": self._meta["next_problem_id"],
+                "nodes": [self._node_record(self._nodes[node_id]) for node_id in sorted(self._nodes)],
+                "edges": [self._edge_record(edge) for edge in self._edges.values()],
+                "problems": [
+                    {
+                        "id": problem.id,
+                        "content": problem.content,
+                        "linked_nodes": problem.linked_nodes,
+                        "difficulty": problem.difficulty,
+                    }
+                    for problem in self._problems.values()
+                ],
+            }
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".snapshot-", suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return path
+
+    def load_snapshot(self, path: str):
+        """从快照整体替换当前数据"""
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"不支持的快照版本: {data.get('version')}")
+
+        nodes = {record["id"]: KnowledgeNode.from_dict(record) for record in data["nodes"]}
+        edges = {
+            (record["source"], record["target"]): KnowledgeEdge(
+                source=record["source"],
+                target=record["target"],
+                weight=record.get("weight", 1.0),
+                relation_type=record.get("relation_type", "prerequisite"),
+                metadata=record.get("metadata", {})
+            )
+            for record in data["edges"]
+        }
+        problems = {record["id"]: Problem(**record) for record in data.get("problems", [])}
+
+        with self._lock:
+            if self._journal is not None:
+                raise RuntimeError("事务中不能加载快照")
+            self._nodes, self._edges, self._problems = nodes, edges, problems
+            self._meta = {"next_problem_id": data.get("next_problem_id", max(problems, default=0) + 1)}
+            self._rebuild_indexes()
+
+    def close(self):
+        """配置了快照路径时写回快照"""
+        if self.snapshot_path:
+            self.save_snapshot()
@@ -0,0 +1,149 @@
+# storage/router.py
+"""
+按用户路由存储 - 每个用户独立的 SQLite 文件与向量集合，打开的句柄按 LRU 淘汰
+
+不同用户的写入落在不同的数据库文件上，不再竞争同一把文件锁。
+"""
+
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional
+
+from .async_store import AsyncGraphStore
+from .base import BaseGraphStorage, BaseVectorStorage
+
+# 当前请求所属的用户（由 Agent 按 user_id 设置，未指定时为 default，随 contextvars 传入工具线程）
+current_user: ContextVar[str] = ContextVar("current_user", default="default")
+
+
+@contextmanager
+def use_user(user_id: str):
+    """在当前上下文中切换用户"""
+    token = current_user.set(user_id)
+    try:
+        yield
+    finally:
+        current_user.reset(token)
+
+
+def user_slug(user_id: str) -> str:
+    """把用户 ID 转成可用作文件名/集合名的片段；有字符被替换时追加哈希避免冲突"""
+    slug = re.sub(r"[^A-Za-z0-9_-]", "_", user_id)[:32]
+    if slug != user_id or not slug or not slug[0].isalnum() or not slug[-1].isalnum():
+        digest = hashlib.sha1(user_id.encode("utf-8")).hexdigest()[:8]
+        slug = f"u{slug}-{digest}"
+    return slug
+
+
+@dataclass
+class UserStores:
+    """单个用户打开的存储句柄"""
+    graph: BaseGraphStorage
+    vector: BaseVectorStorage
+    async_graph: Optional[AsyncGraphStore] = None
+    leases: int = 0
+
+    def close(self):
+        if self.async_graph is not None:
+            self.async_graph.close()
+        self.graph.close()
+
+
+class StoreRouter:
+    """用户 -> 存储句柄的 LRU 路由
+
+    正在被 lease() 使用的句柄不会被淘汰；全部句柄都在使用时允许临时超出 max_open。
+    """
+
+    def __init__(self, factory: Callable[[str], UserStores], max_open: int = 32):
+        self.factory = factory
+        self.max_open = max_open
+        self._stores: "OrderedDict[str, UserStores]" = OrderedDict()
+        self._lock = threading.RLock()
+        # 正在打开的用户 -> 锁：同一用户只打开一次，不同用户的打开互不阻塞
+        self._opening: Dict[str, threading.Lock] = {}
+
+    def _lookup(self, user_id: str) -> Optional[UserStores]:
+        with self._lock:
+            stores = self._stores.get(user_id)
+            if stores is not None:
+                self._stores.move_to_end(user_id)
+            return stores
+
+    def get(self, user_id: str) -> UserStores:
+        """获取（必要时打开）用户的存储句柄，并标记为最近使用
+
+        打开（迁移、WAL 初始化等）在全局锁之外进行，慢的打开不会阻塞其他用户。
+        """
+        stores = self._lookup(user_id)
+        if stores is not None:
+            return stores
+
+        with self._lock:
+            opening = self._opening.setdefault(user_id, threading.Lock())
+        with opening:
+            # 等待期间可能已由其他线程打开
+            stores = self._lookup(user_id)
+            if stores is not None:
+                return stores
+            try:
+                created = self.factory(user_id)
+                with self._lock:
+                    stores = self._stores.get(user_id)
+                    if stores is None:
+                        stores = self._stores[user_id] = created
+                        self._evict(keep=user_id)
+                        created = None
+                    else:
+                        self._stores.move_to_end(user_id)
+            finally:
+                with self._lock:
+                    if self._opening.get(user_id) is opening:
+                        del self._opening[user_id]
+        if created is not None:
+            # 前一次打开失败后另一个线程已抢先打开，丢弃本次打开的句柄
+            created.close()
+        return stores
+
+    @contextmanager
+    def lease(self, user_id: str):
+        """在 with 块内占用用户的句柄，期间不会被淘汰关闭"""
+        while True:
+            stores = self.get(user_id)
+            with self._lock:
+                # get 返回后到加锁前可能已被淘汰，需重新打开
+                if self._stores.get(user_id) is stores:
+                    stores.leases += 1
+                    break
+        try:
+            yield stores
+        finally:
+            with self._lock:
+                stores.leases -= 1
+                self._evict()
+
+    def _evict(self, keep: Optional[str] = None):
+        """关闭最久未使用且空闲的句柄，直到数量不超过 max_open（keep 为刚打开、即将返回的用户）"""
+        while len(self._stores) > self.max_open:
+            idle = next(
+                (uid for uid, s in self._stores.items() if s.leases == 0 and uid != keep),
+                None
+            )
+            if idle is None:
+                return
+            self._stores.pop(idle).close()
+
+    def __len__(self) -> int:
+        return len(self._stores)
+
+    def close(self):
+        """关闭所有句柄"""
+        with self._lock:
+            stores, self._stores = list(self._stores.values()), OrderedDict()
+        for item in stores:
+            item.close()
@@ -5,38 +5,377 @@ SQLite 图存储实现
 
 import sqlite3
 import json
-from typing import Dict, List, Optional, Any
+import re
+import threading
+from typing import Dict, List, Optional, Any, Tuple, Iterator, Callable, Sequence, Union
 from contextlib import contextmanager
-import networkx as nx
 
+from .adjacency import AdjacencyIndex
+from .compact_graph import CompactGraph
 from .base import (
     BaseGraphStorage,
     KnowledgeNode,
     KnowledgeEdge,
-    Problem
+    Change,
+    NodeRow,
+    Problem,
+    check_node_fields,
+    normalize_text
 )
 
 
+_UPSERT_NODE_SQL = '''
+    INSERT INTO nodes (id, description, difficulty, proficiency, aliases, metadata)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT(id) DO UPDATE SET
+        description = excluded.description,
+        difficulty = excluded.difficulty,
+        proficiency = excluded.proficiency,
+        aliases = excluded.aliases,
+        metadata = excluded.metadata,
+        updated_at = CURRENT_TIMESTAMP
+'''
+
+_UPSERT_EDGE_SQL = '''
+    INSERT INTO edges (source, target, weight, relation_type, metadata)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(source, target) DO UPDATE SET
+        weight = excluded.weight,
+        relation_type = excluded.relation_type,
+        metadata = excluded.metadata
+'''
+
+# 熟练度分桶，与 get_statistics 的“未学习/学习中/已掌握”一致
+_BUCKET_SQL = "CASE WHEN {p} < 0.3 THEN 'unlearned' WHEN {p} < 0.7 THEN 'learning' ELSE 'mastered' END"
+
+# 由触发器维护的统计计数器（stat_counters=True 时启用）
+_COUNTER_TRIGGERS = [
+    f'''
+    CREATE TRIGGER IF NOT EXISTS trg_counters_nodes_insert AFTER INSERT ON nodes BEGIN
+        UPDATE graph_counters SET value = value + 1
+        WHERE name IN ('node_count', {_BUCKET_SQL.format(p="NEW.proficiency")});
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS trg_counters_nodes_delete AFTER DELETE ON nodes BEGIN
+        UPDATE graph_counters SET value = value - 1
+        WHERE name IN ('node_count', {_BUCKET_SQL.format(p="OLD.proficiency")});
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS trg_counters_nodes_proficiency AFTER UPDATE OF proficiency ON nodes BEGIN
+        UPDATE graph_counters SET value = value - 1
+        WHERE name = {_BUCKET_SQL.format(p="OLD.proficiency")};
+        UPDATE graph_counters SET value = value + 1
+        WHERE name = {_BUCKET_SQL.format(p="NEW.proficiency")};
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_counters_edges_insert AFTER INSERT ON edges BEGIN
+        UPDATE graph_counters SET value = value + 1 WHERE name = 'edge_count';
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_counters_edges_delete AFTER DELETE ON edges BEGIN
+        UPDATE graph_counters SET value = value - 1 WHERE name = 'edge_count';
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_counters_problems_insert AFTER INSERT ON problems BEGIN
+        UPDATE graph_counters SET value = value + 1 WHERE name = 'problem_count';
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_counters_problems_delete AFTER DELETE ON problems BEGIN
+        UPDATE graph_counters SET value = value - 1 WHERE name = 'problem_count';
+    END
+    ''',
+]
+
+# 变更日志触发器，payload 为变更后的值。触发器属于数据库而非某个存储实例：
+# change_log=True 时安装，之后对该库的所有连接生效，只能经 disable_change_log() 显式移除
+_NODE_PAYLOAD_SQL = (
+    "json_object('id', {r}.id, 'description', {r}.description, 'difficulty', {r}.difficulty, "
+    "'proficiency', {r}.proficiency, 'aliases', json({r}.aliases), 'metadata', json({r}.metadata))"
+)
+_EDGE_PAYLOAD_SQL = (
+    "json_object('source', {r}.source, 'target', {r}.target, 'weight', {r}.weight, "
+    "'relation_type', {r}.relation_type, 'metadata', json({r}.metadata))"
+)
+_CHANGE_LOG_TRIGGERS = {
+    "trg_changes_nodes_insert": f'''
+    CREATE TRIGGER IF NOT EXISTS trg_changes_nodes_insert AFTER INSERT ON nodes BEGIN
+        INSERT INTO changes (entity, op, entity_id, payload)
+        VALUES ('node', 'insert', NEW.id, {_NODE_PAYLOAD_SQL.format(r="NEW")});
+    END
+    ''',
+    "trg_changes_nodes_update": f'''
+    CREATE TRIGGER IF NOT EXISTS trg_changes_nodes_update AFTER UPDATE ON nodes
+    WHEN OLD.description IS NOT NEW.description OR OLD.difficulty IS NOT NEW.difficulty
+        OR OLD.aliases IS NOT NEW.aliases OR OLD.metadata IS NOT NEW.metadata
+    BEGIN
+        INSERT INTO changes (entity, op, entity_id, payload)
+        VALUES ('node', 'update', NEW.id, {_NODE_PAYLOAD_SQL.format(r="NEW")});
+    END
+    ''',
+    "trg_changes_nodes_proficiency": '''
+    CREATE TRIGGER IF NOT EXISTS trg_changes_nodes_proficiency AFTER UPDATE OF proficiency ON nodes
+    WHEN OLD.proficiency IS NOT NEW.proficiency
+    BEGIN
+        INSERT INTO changes (entity, op, entity_id, payload)
+        VALUES ('proficiency', 'update', NEW.id,
+                json_object('old', OLD.proficiency, 'new', NEW.proficiency));
+    END
+    ''',
+    "trg_changes_nodes_delete": '''
+    CREATE TRIGGER IF NOT EXISTS trg_changes_nodes_delete AFTER DELETE ON nodes BEGIN
+        INSERT INTO changes (entity, op, entity_id) VALUES ('node', 'delete', OLD.id);
+    END
+    ''',
+    "trg_changes_edges_insert": f'''
+    CREATE TRIGGER IF NOT EXISTS trg_changes_edges_insert AFTER INSERT ON edges BEGIN
+        INSERT INTO changes (entity, op, entity_id, payload)
+        VALUES ('edge', 'insert', json_array(NEW.source, NEW.target), {_EDGE_PAYLOAD_SQL.format(r="NEW")});
+    END
+    ''',
+    "trg_changes_edges_update": f'''
+    CREATE TRIGGER IF NOT EXISTS trg_changes_edges_update AFTER UPDATE ON edges
+    WHEN OLD.weight IS NOT NEW.weight OR OLD.relation_type IS NOT NEW.relation_type
+        OR OLD.metadata IS NOT NEW.metadata
+    BEGIN
+        INSERT INTO changes (entity, op, entity_id, payload)
+        VALUES ('edge', 'update', json_array(NEW.source, NEW.target), {_EDGE_PAYLOAD_SQL.format(r="NEW")});
+    END
+    ''',
+    # 改写端点（如 merge_nodes 改接边）记为旧边删除 + 新边插入
+    "trg_changes_edges_rekey": f'''
+    CREATE TRIGGER IF NOT EXISTS trg_changes_edges_rekey AFTER UPDATE OF source, target ON edges
+    WHEN OLD.source IS NOT NEW.source OR OLD.target IS NOT NEW.target
+    BEGIN
+        INSERT INTO changes (entity, op, entity_id)
+        VALUES ('edge', 'delete', json_array(OLD.source, OLD.target));
+        INSERT INTO changes (entity, op, entity_id, payload)
+        VALUES ('edge', 'insert', json_array(NEW.source, NEW.target), {_EDGE_PAYLOAD_SQL.format(r="NEW")});
+    END
+    ''',
+    "trg_changes_edges_delete": '''
+    CREATE TRIGGER IF NOT EXISTS trg_changes_edges_delete AFTER DELETE ON edges BEGIN
+        INSERT INTO changes (entity, op, entity_id)
+        VALUES ('edge', 'delete', json_array(OLD.source, OLD.target));
+    END
+    ''',
+}
+
+# 全文索引（外部内容表指向 nodes，由触发器同步）
+_FTS_TRIGGERS = {
+    "trg_nodes_fts_insert": '''
+    CREATE TRIGGER IF NOT EXISTS trg_nodes_fts_insert AFTER INSERT ON nodes BEGIN
+        INSERT INTO nodes_fts (rowid, id, description, aliases)
+        VALUES (NEW.rowid, NEW.id, NEW.description, NEW.aliases);
+    END
+    ''',
+    "trg_nodes_fts_delete": '''
+    CREATE TRIGGER IF NOT EXISTS trg_nodes_fts_delete AFTER DELETE ON nodes BEGIN
+        INSERT INTO nodes_fts (nodes_fts, rowid, id, description, aliases)
+        VALUES ('delete', OLD.rowid, OLD.id, OLD.description, OLD.aliases);
+    END
+    ''',
+    "trg_nodes_fts_update": '''
+    CREATE TRIGGER IF NOT EXISTS trg_nodes_fts_update AFTER UPDATE OF id, description, aliases ON nodes BEGIN
+        INSERT INTO nodes_fts (nodes_fts, rowid, id, description, aliases)
+        VALUES ('delete', OLD.rowid, OLD.id, OLD.description, OLD.aliases);
+        INSERT INTO nodes_fts (rowid, id, description, aliases)
+        VALUES (NEW.rowid, NEW.id, NEW.description, NEW.aliases);
+    END
+    ''',
+}
+
+# bm25 列权重：id、description、aliases
+_FTS_BM25_SQL = "bm25(nodes_fts, 10.0, 1.0, 5.0)"
+
+# 单条 IN (...) 查询的参数上限，低于旧版 SQLite 的 999 个变量限制
+_IN_CHUNK_SIZE = 500
+
+_INSERT_PROBLEM_SQL = '''
+    INSERT INTO problems (content, linked_nodes, difficulty)
+    VALUES (?, ?, ?)
+'''
+
+
 class SQLiteGraphStore(BaseGraphStorage):
-    """SQLite 图存储"""
+    """SQLite 图存储
 
-    def __init__(self, db_path: str = "knowledge.db"):
+    pooled=True 时每个线程持有一条常驻连接（WAL 模式），避免每次调用都重新建立连接；
+    pooled=False 时保持“每次调用一条新连接”的旧行为。
+    """
+
+    def __init__(
+            self,
+            db_path: str = "knowledge.db",
+            pooled: bool = True,
+            synchronous: str = "NORMAL",
+            cache_size_kb: int = 16384,
+            mmap_size: int = 256 * 1024 * 1024,
+            busy_timeout: float = 5.0,
+            cached_statements: int = 256,
+            stat_counters: bool = False,
+            closure_table: bool = False,
+            change_log: bool = False,
+    ):
         self.db_path = db_path
+        self.pooled = pooled
+        self.synchronous = synchronous
+        self.cache_size_kb = cache_size_kb
+        self.mmap_size = mmap_size
+        self.busy_timeout = busy_timeout
+        self.cached_statements = cached_statements
+        self.stat_counters = stat_counters
+        self.closure_table = closure_table
+        self.change_log = change_log
+
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._pool_lock = threading.Lock()
+
+        # 边结构的内存缓存，按 graph_meta.edge_generation 判断是否过期
+        self._adjacency: Optional[AdjacencyIndex] = None
+        self._adjacency_lock = threading.RLock()
+
+        # 变更订阅者，提交后按 seq 顺序推送新增的变更
+        self._subscribers: List[Callable[[List[Change]], None]] = []
+        self._published_seq = 0
+        self._publish_lock = threading.Lock()
+
+        # 专用于 PRAGMA data_version 的连接：其他连接（含本进程的连接池）提交后其值会变化
+        self._version_conn: Optional[sqlite3.Connection] = None
+        self._version_lock = threading.Lock()
+
         self._init_db()
 
+    def _connect(self) -> sqlite3.Connection:
+        """新建连接并应用 PRAGMA"""
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.busy_timeout,
+            cached_statements=self.cached_statements,
+            check_same_thread=False
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA synchronous={self.synchronous}")
+        conn.execute(f"PRAGMA cache_size=-{int(self.cache_size_kb)}")
+        conn.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        return conn
+
+    def _acquire(self) -> sqlite3.Connection:
+        """获取当前线程的连接（连接池模式下复用常驻连接）"""
+        if not self.pooled:
+            return self._connect()
+
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+            with self._pool_lock:
+                self._connections.append(conn)
+        return conn
+
     @contextmanager
     def _get_conn(self):
-        """获取数据库连接的上下文管理器"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
+        """获取数据库连接的上下文管理器
+
+        处于 transaction() 中时复用事务连接且不单独提交；
+        最外层提交成功后才执行 call_after_commit 登记的回调，回滚则丢弃。
+        """
+        local = self._local
+        active = getattr(local, "active", None)
+        if active is not None:
+            yield active
+            return
+
+        conn = self._acquire()
+        local.active = conn
+        local.after_commit = []
+        total_changes = conn.total_changes
         try:
             yield conn
+            wrote = conn.total_changes != total_changes
+            if wrote:
+                # 仍持有写锁，此刻的版本号只包含本次提交之前的写入
+                before = self.data_version()
+                own_version = conn.execute("PRAGMA data_version").fetchone()[0]
             conn.commit()
-        except Exception:
+            if wrote:
+                # 本连接的 data_version 不因自身提交变化，变了说明提交后已有其他连接写入
+                after = self.data_version()
+                isolated = conn.execute("PRAGMA data_version").fetchone()[0] == own_version
+                local.commit_versions = (before, after if isolated else None)
+        except BaseException:
             conn.rollback()
+            self._on_rollback()
             raise
         finally:
-            conn.close()
+            callbacks = local.after_commit
+            local.active = None
+            local.after_commit = []
+            if not self.pooled:
+                conn.close()
+
+        for callback in callbacks:
+            callback()
+        if wrote and self._subscribers:
+            self._publish_changes()
+
+    @contextmanager
+    def transaction(self):
+        """工作单元: 块内的读写共用一条连接，结束时一次提交，异常时整体回滚
+
+        可嵌套，内层并入最外层事务。
+        """
+        with self._get_conn() as conn:
+            if not conn.in_transaction:
+                # 立即获取写锁，避免读后写时与其他连接发生锁升级冲突
+                conn.execute("BEGIN IMMEDIATE")
+            yield self
+
+    def call_after_commit(self, callback: Callable, *args, **kwargs):
+        """在当前事务提交后执行回调（如向量库同步）；不在事务中则立即执行"""
+        if getattr(self._local, "active", None) is None:
+            callback(*args, **kwargs)
+        else:
+            self._local.after_commit.append(lambda: callback(*args, **kwargs))
+
+    def _on_rollback(self):
+        """回滚后丢弃可能包含未提交数据的缓存"""
+        with self._adjacency_lock:
+            self._adjacency = None
+
+    def data_version(self) -> Optional[int]:
+        """PRAGMA data_version：任意其他连接提交写入后变化，读取开销很小"""
+        with self._version_lock:
+            if self._version_conn is None:
+                self._version_conn = self._connect()
+            return self._version_conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def last_commit_versions(self) -> Optional[Tuple[int, Optional[int]]]:
+        """本线程最近一次写入提交前后的 data_version（在提交前后各读一次，见 _get_conn）"""
+        return getattr(self._local, "commit_versions", None)
+
+    def close(self):
+        """关闭连接池中的所有连接"""
+        with self._pool_lock:
+            connections, self._connections = self._connections, []
+            self._local = threading.local()
+        with self._version_lock:
+            if self._version_conn is not None:
+                connections.append(self._version_conn)
+                self._version_conn = None
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
 
     def _init_db(self):
         """初始化数据库"""
@@ -72,33 +411,511 @@ class SQLiteGraphStore(BaseGraphStorage):
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                 );
 
+                CREATE TABLE IF NOT EXISTS node_aliases (
+                    alias_key TEXT NOT NULL,
+                    node_id TEXT NOT NULL,
+                    is_primary INTEGER DEFAULT 0,
+                    PRIMARY KEY (node_id, alias_key)
+                );
+
+                CREATE TABLE IF NOT EXISTS problem_nodes (
+                    problem_id INTEGER NOT NULL,
+                    node_id TEXT NOT NULL,
+                    PRIMARY KEY (problem_id, node_id)
+                );
+
+                CREATE TABLE IF NOT EXISTS graph_meta (
+                    key TEXT PRIMARY KEY,
+                    value INTEGER DEFAULT 0
+                );
+
+                INSERT OR IGNORE INTO graph_meta (key, value) VALUES ('edge_generation', 0);
+                INSERT OR IGNORE INTO graph_meta (key, value) VALUES ('closure_generation', -1);
+
+                CREATE TABLE IF NOT EXISTS closure (
+                    ancestor TEXT NOT NULL,
+                    descendant TEXT NOT NULL,
+                    depth INTEGER NOT NULL,
+                    PRIMARY KEY (ancestor, descendant)
+                );
+
+                CREATE TABLE IF NOT EXISTS topo_order (
+                    node_id TEXT PRIMARY KEY,
+                    ord INTEGER NOT NULL
+                );
+
+                CREATE TABLE IF NOT EXISTS graph_counters (
+                    name TEXT PRIMARY KEY,
+                    value INTEGER DEFAULT 0
+                );
+
+                CREATE TABLE IF NOT EXISTS changes (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    entity TEXT NOT NULL,
+                    op TEXT NOT NULL,
+                    entity_id TEXT NOT NULL,
+                    payload TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                );
+
                 CREATE INDEX IF NOT EXISTS idx_edges_source ON edges(source);
                 CREATE INDEX IF NOT EXISTS idx_edges_target ON edges(target);
+                CREATE INDEX IF NOT EXISTS idx_node_aliases_key ON node_aliases(alias_key, is_primary);
+                CREATE INDEX IF NOT EXISTS idx_problem_nodes_node ON problem_nodes(node_id);
+                CREATE INDEX IF NOT EXISTS idx_closure_descendant ON closure(descendant, depth);
+                CREATE INDEX IF NOT EXISTS idx_topo_order_ord ON topo_order(ord);
             ''')
+            self._migrate(conn)
+            if self.stat_counters:
+                self._install_counters(conn)
+            if self.closure_table:
+                self._ensure_closure(conn)
+            self._install_change_log(conn)
+            self._fts_tokenizer = self._ensure_fts(conn)
+
+    def _migrate(self, conn: sqlite3.Connection):
+        """按 PRAGMA user_version 逐步迁移旧数据库"""
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        migrations = [
+            self._backfill_aliases,
+            self._backfill_problem_nodes,
+            self._backfill_topo_order,
+        ]
+        for target_version, migration in enumerate(migrations, 1):
+            if version < target_version:
+                migration(conn)
+                conn.execute(f"PRAGMA user_version = {target_version}")
+
+    def _backfill_aliases(self, conn: sqlite3.Connection):
+        """迁移 1: 由 nodes.aliases 回填别名索引表"""
+        rows = conn.execute("SELECT id, aliases FROM nodes").fetchall()
+        for row in rows:
+            self._sync_aliases(conn, row["id"], json.loads(row["aliases"]))
+
+    def _backfill_problem_nodes(self, conn: sqlite3.Connection):
+        """迁移 2: 由 problems.linked_nodes 回填题目-知识点关联表"""
+        rows = conn.execute("SELECT id, linked_nodes FROM problems").fetchall()
+        conn.executemany(
+            "INSERT OR IGNORE INTO problem_nodes (problem_id, node_id) VALUES (?, ?)",
+            [
+                (row["id"], node_id)
+                for row in rows
+                for node_id in json.loads(row["linked_nodes"])
+            ]
+        )
+
+    def _backfill_topo_order(self, conn: sqlite3.Connection):
+        """迁移 3: 为已有的边计算初始拓扑序（历史数据中若有环，环上节点按 ID 排在最后）"""
+        adjacency = AdjacencyIndex.from_edges(
+            (row["source"], row["target"], row["weight"])
+            for row in conn.execute("SELECT source, target, weight FROM edges")
+        )
+        order = adjacency.topological_sort(
+            set(adjacency.forward) | set(adjacency.reverse), strict=False
+        )
+        conn.execute("DELETE FROM topo_order")
+        conn.executemany(
+            "INSERT INTO topo_order (node_id, ord) VALUES (?, ?)",
+            ((node_id, ord_) for ord_, node_id in enumerate(order, 1))
+        )
+
+    @staticmethod
+    def _install_counters(conn: sqlite3.Connection):
+        """首次启用计数器时创建触发器并按当前数据重算一次
+
+        触发器已存在时说明计数器一直在被维护，直接复用，启动开销为 O(1)。
+        """
+        installed = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'trg_counters_nodes_insert'"
+        ).fetchone()
+        if installed:
+            return
+
+        if not conn.in_transaction:
+            conn.execute("BEGIN IMMEDIATE")
+        for trigger_sql in _COUNTER_TRIGGERS:
+            conn.execute(trigger_sql)
+
+        statistics = SQLiteGraphStore._aggregate_statistics(conn)
+        dist = statistics["proficiency_distribution"]
+        conn.execute("DELETE FROM graph_counters")
+        conn.executemany("INSERT INTO graph_counters (name, value) VALUES (?, ?)", [
+            ("node_count", statistics["node_count"]),
+            ("edge_count", statistics["edge_count"]),
+            ("problem_count", statistics["problem_count"]),
+            ("unlearned", dist["未学习"]),
+            ("learning", dist["学习中"]),
+            ("mastered", dist["已掌握"]),
+        ])
+
+    @staticmethod
+    def _ensure_fts(conn: sqlite3.Connection) -> Optional[str]:
+        """确保全文索引存在，返回所用分词器；当前 SQLite 未编译 FTS5 时返回 None
+
+        优先使用 trigram（支持中文子串匹配），不可用时退回 unicode61。
+        """
+        row = conn.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'nodes_fts'"
+        ).fetchone()
+        if row:
+            return "trigram" if "trigram" in row["sql"] else "unicode61"
+
+        if not conn.in_transaction:
+            conn.execute("BEGIN IMMEDIATE")
+        for tokenizer in ("trigram", "unicode61"):
+            try:
+                conn.execute(f'''
+                    CREATE VIRTUAL TABLE nodes_fts USING fts5(
+                        id, description, aliases,
+                        content='nodes', content_rowid='rowid', tokenize='{tokenizer}'
+                    )
+                ''')
+                break
+            except sqlite3.OperationalError:
+                continue
+        else:
+            return None
+
+        for trigger_sql in _FTS_TRIGGERS.values():
+            conn.execute(trigger_sql)
+        conn.execute("INSERT INTO nodes_fts (nodes_fts) VALUES ('rebuild')")
+        return tokenizer
+
+    def _install_change_log(self, conn: sqlite3.Connection):
+        """安装缺失的变更日志触发器，从不移除
+
+        change_log=True 或库中已启用变更日志（已有 trg_changes_* 触发器）时补齐全部触发器，
+        self.change_log 随之反映库的实际状态；以 change_log=False 打开不会关闭其他使用者的变更日志。
+        """
+        installed = {
+            row["name"] for row in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'trg_changes_%'"
+            )
+        }
+        self.change_log = self.change_log or bool(installed)
+        missing = set(_CHANGE_LOG_TRIGGERS) - installed if self.change_log else set()
+        if not missing:
+            return
+
+        if not conn.in_transaction:
+            conn.execute("BEGIN IMMEDIATE")
+        for name in sorted(missing):
+            conn.execute(_CHANGE_LOG_TRIGGERS[name])
+
+    def disable_change_log(self):
+        """移除变更日志触发器，对该数据库的所有使用者生效（已有的日志保留）"""
+        with self._get_conn() as conn:
+            if not conn.in_transaction:
+                conn.execute("BEGIN IMMEDIATE")
+            names = [
+                row["name"] for row in conn.execute(
+                    "SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'trg_changes_%'"
+                )
+            ]
+            for name in names:
+                conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+        self.change_log = False
+
+    @staticmethod
+    def _sync_aliases(conn: sqlite3.Connection, node_id: str, aliases: List[str]):
+        """重写节点在别名索引表中的记录（节点 ID 本身也作为主别名登记）"""
+        SQLiteGraphStore._sync_aliases_many(conn, [(node_id, aliases)])
+
+    @staticmethod
+    def _sync_aliases_many(conn: sqlite3.Connection, items: List[Tuple[str, List[str]]]):
+        """批量重写别名索引表"""
+        rows = []
+        for node_id, aliases in items:
+            primary_key = node_id.lower()
+            rows.append((primary_key, node_id, 1))
+            rows.extend(
+                (key, node_id, 0)
+                for key in {alias.lower() for alias in aliases} - {primary_key}
+            )
+        conn.executemany(
+            "DELETE FROM node_aliases WHERE node_id = ?",
+            [(node_id,) for node_id, _ in items]
+        )
+        conn.executemany(
+            "INSERT OR IGNORE INTO node_aliases (alias_key, node_id, is_primary) VALUES (?, ?, ?)",
+            rows
+        )
+
+    @staticmethod
+    def _node_params(node: KnowledgeNode) -> tuple:
+        return (
+            node.id,
+            node.description,
+            node.difficulty,
+            node.proficiency,
+            json.dumps(node.aliases, ensure_ascii=False),
+            json.dumps(node.metadata, ensure_ascii=False)
+        )
+
+    @staticmethod
+    def _edge_params(edge: KnowledgeEdge) -> tuple:
+        return (
+            edge.source,
+            edge.target,
+            edge.weight,
+            edge.relation_type,
+            json.dumps(edge.metadata, ensure_ascii=False)
+        )
+
+    # 邻接缓存
+    def _edges_changed(self, conn: sqlite3.Connection, change: Callable[[AdjacencyIndex], None]):
+        """边结构变化: 递增代数，并在提交后把 change 增量应用到邻接缓存"""
+        conn.execute("UPDATE graph_meta SET value = value + 1 WHERE key = 'edge_generation'")
+        generation = conn.execute(
+            "SELECT value FROM graph_meta WHERE key = 'edge_generation'"
+        ).fetchone()[0]
+        if self.closure_table:
+            # 调用方已在同一事务内维护了闭包表
+            conn.execute(
+                "UPDATE graph_meta SET value = ? WHERE key = 'closure_generation'", (generation,)
+            )
+        self.call_after_commit(self._apply_adjacency, generation, change)
+
+    # 传递闭包表
+    def _ensure_closure(self, conn: sqlite3.Connection):
+        """闭包表落后于边结构时（如被未启用闭包的进程写入过）整体重建"""
+        row = conn.execute('''
+            SELECT
+                (SELECT value FROM graph_meta WHERE key = 'edge_generation') AS edges,
+                (SELECT value FROM graph_meta WHERE key = 'closure_generation') AS closure
+        ''').fetchone()
+        if row["edges"] != row["closure"]:
+            self._rebuild_closure(conn)
+            conn.execute(
+                "UPDATE graph_meta SET value = ? WHERE key = 'closure_generation'", (row["edges"],)
+            )
+
+    @staticmethod
+    def _rebuild_closure(conn: sqlite3.Connection):
+        """由 edges 表全量重建闭包表（BFS 求最短深度）"""
+        adjacency = AdjacencyIndex.from_edges(
+            (row["source"], row["target"], row["weight"])
+            for row in conn.execute("SELECT source, target, weight FROM edges")
+        )
+        conn.execute("DELETE FROM closure")
+        conn.executemany(
+            "INSERT INTO closure (ancestor, descendant, depth) VALUES (?, ?, ?)",
+            (
+                (source, descendant, depth)
+                for source in list(adjacency.forward)
+                for descendant, depth in adjacency.distances(source).items()
+            )
+        )
+
+    def rebuild_closure(self):
+        """手动全量重建闭包表"""
+        with self._get_conn() as conn:
+            conn.execute("UPDATE graph_meta SET value = -1 WHERE key = 'closure_generation'")
+            self._ensure_closure(conn)
+
+    @staticmethod
+    def _closure_add_edge(conn: sqlite3.Connection, source: str, target: str):
+        """新增边 source -> target: (source 的祖先 ∪ source) × (target 的后代 ∪ target) 变为可达"""
+        conn.execute('''
+            INSERT INTO closure (ancestor, descendant, depth)
+            SELECT a.ancestor, d.descendant, a.depth + d.depth + 1
+            FROM (
+                SELECT ancestor, depth FROM closure WHERE descendant = :source
+                UNION ALL SELECT :source, 0
+            ) a, (
+                SELECT descendant, depth FROM closure WHERE ancestor = :target
+                UNION ALL SELECT :target, 0
+            ) d
+            WHERE a.ancestor != d.descendant
+            ON CONFLICT(ancestor, descendant) DO UPDATE SET
+                depth = MIN(depth, excluded.depth)
+        ''', {"source": source, "target": target})
+
+    @staticmethod
+    def _closure_remove_node(conn: sqlite3.Connection, node_id: str):
+        """删除节点前调用: 移除与其相关的闭包行，并重算其祖先的可达集
+
+        祖先按可达节点数升序处理（DAG 中后继的可达集严格更小），
+        保证重算某个祖先时其后继的闭包行已是最新。
+        """
+        ancestors = [
+            row["ancestor"]
+            for row in conn.execute('''
+                SELECT c.ancestor FROM closure c
+                WHERE c.descendant = ?
+                ORDER BY (SELECT COUNT(*) FROM closure r WHERE r.ancestor = c.ancestor)
+            ''', (node_id,))
+        ]
+        conn.execute("DELETE FROM closure WHERE ancestor = ? OR descendant = ?", (node_id, node_id))
+        for ancestor in ancestors:
+            conn.execute("DELETE FROM closure WHERE ancestor = ?", (ancestor,))
+            conn.execute('''
+                INSERT INTO closure (ancestor, descendant, depth)
+                SELECT :ancestor, descendant, MIN(depth) FROM (
+                    SELECT target AS descendant, 1 AS depth FROM edges
+                    WHERE source = :ancestor AND target != :removed
+                    UNION ALL
+                    SELECT c.descendant, c.depth + 1 FROM edges e
+                    JOIN closure c ON c.ancestor = e.target
+                    WHERE e.source = :ancestor AND e.target != :removed
+                )
+                WHERE descendant != :ancestor AND descendant != :removed
+                GROUP BY descendant
+            ''', {"ancestor": ancestor, "removed": node_id})
+
+    def is_prerequisite(self, ancestor: str, descendant: str) -> bool:
+        """ancestor 是否为 descendant 的（直接或间接）前置知识"""
+        if self.closure_table:
+            with self._get_conn() as conn:
+                self._ensure_closure(conn)
+                row = conn.execute(
+                    "SELECT 1 FROM closure WHERE ancestor = ? AND descendant = ?",
+                    (ancestor, descendant)
+                ).fetchone()
+                return row is not None
+
+        with self._adjacency_lock:
+            return ancestor in self._load_adjacency().ancestors(descendant)
+
+    def _closure_related(self, node_id: str, direction: str, max_depth: Optional[int]) -> List[str]:
+        """从闭包表读取祖先(up)/后代(down)，可按最短深度过滤"""
+        column, key = ("ancestor", "descendant") if direction == "up" else ("descendant", "ancestor")
+        with self._get_conn() as conn:
+            self._ensure_closure(conn)
+            rows = conn.execute(
+                f"SELECT {column} AS id FROM closure WHERE {key} = :node_id"
+                + ("" if max_depth is None else " AND depth <= :max_depth")
+                + " ORDER BY id",
+                {"node_id": node_id, "max_depth": max_depth}
+            ).fetchall()
+            return [row["id"] for row in rows]
+
+    # 动态拓扑序（Pearce-Kelly）
+    @staticmethod
+    def _topo_orders(conn: sqlite3.Connection, node_ids: List[str]) -> Dict[str, int]:
+        """读取节点拓扑序号，缺失的节点追加到序列末尾"""
+        placeholders = ",".join("?" * len(node_ids))
+        orders = {
+            row["node_id"]: row["ord"]
+            for row in conn.execute(
+                f"SELECT node_id, ord FROM topo_order WHERE node_id IN ({placeholders})", node_ids
+            )
+        }
+        for node_id in node_ids:
+            if node_id not in orders:
+                next_ord = conn.execute("SELECT COALESCE(MAX(ord), 0) + 1 FROM topo_order").fetchone()[0]
+                conn.execute("INSERT INTO topo_order (node_id, ord) VALUES (?, ?)", (node_id, next_ord))
+                orders[node_id] = next_ord
+        return orders
+
+    @staticmethod
+    def _topo_add_edge(conn: sqlite3.Connection, source: str, target: str) -> Dict[str, int]:
+        """插入边前维护拓扑序，返回序号发生变化的节点；会形成环时抛出 ValueError
+
+        只搜索序号落在 [ord(target), ord(source)] 区间内的受影响区域，
+        与整图规模无关。
+        """
+        if source == target:
+            raise ValueError(f"依赖 {source} → {target} 会形成环")
+
+        orders = SQLiteGraphStore._topo_orders(conn, [source, target])
+        lower, upper = orders[target], orders[source]
+        if lower > upper:
+            return orders
+
+        def search(start: str, start_ord: int, sql: str, bound: int, forward: bool) -> Dict[str, int]:
+            found = {start: start_ord}
+            stack = [start]
+            while stack:
+                for node_id, ord_ in conn.execute(sql, (stack.pop(), bound)):
+                    if forward and node_id == source:
+                        raise ValueError(f"依赖 {source} → {target} 会形成环")
+                    if node_id not in found:
+                        found[node_id] = ord_
+                        stack.append(node_id)
+            return found
+
+        delta_forward = search(target, lower, '''
+            SELECT e.target, t.ord FROM edges e JOIN topo_order t ON t.node_id = e.target
+            WHERE e.source = ? AND t.ord <= ?
+        ''', upper, forward=True)
+        delta_backward = search(source, upper, '''
+            SELECT e.source, t.ord FROM edges e JOIN topo_order t ON t.node_id = e.source
+            WHERE e.target = ? AND t.ord >= ?
+        ''', lower, forward=False)
+
+        # 受影响节点复用原有序号：前置区域整体排在后续区域之前，区域内相对顺序不变
+        slots = sorted(list(delta_forward.values()) + list(delta_backward.values()))
+        moved = (
+            sorted(delta_backward, key=delta_backward.get)
+            + sorted(delta_forward, key=delta_forward.get)
+        )
+        changes = dict(zip(moved, slots))
+        conn.executemany(
+            "UPDATE topo_order SET ord = ? WHERE node_id = ?",
+            [(ord_, node_id) for node_id, ord_ in changes.items()]
+        )
+        return changes
+
+    def _load_adjacency(self) -> AdjacencyIndex:
+        """返回与数据库一致的邻接缓存（调用方需持有 _adjacency_lock）"""
+        with self._get_conn() as conn:
+            generation = conn.execute(
+                "SELECT value FROM graph_meta WHERE key = 'edge_generation'"
+            ).fetchone()[0]
+            if self._adjacency is None or self._adjacency.generation != generation:
+                rows = conn.execute("SELECT source, target, weight FROM edges")
+                self._adjacency = AdjacencyIndex.from_edges(
+                    ((row["source"], row["target"], row["weight"]) for row in rows),
+                    generation
+                )
+                self._adjacency.order = {
+                    row["node_id"]: row["ord"]
+                    for row in conn.execute("SELECT node_id, ord FROM topo_order")
+                }
+        return self._adjacency
+
+    def _apply_adjacency(self, generation: int, change):
+        """把本地写入增量同步到缓存；若期间有其他进程写入则丢弃缓存"""
+        with self._adjacency_lock:
+            if self._adjacency is not None and self._adjacency.generation == generation - 1:
+                change(self._adjacency)
+                self._adjacency.generation = generation
+            else:
+                self._adjacency = None
 
     def add_node(self, node: KnowledgeNode) -> str:
         """添加或更新节点"""
         with self._get_conn() as conn:
-            conn.execute('''
-                INSERT INTO nodes (id, description, difficulty, proficiency, aliases, metadata)
-                VALUES (?, ?, ?, ?, ?, ?)
-                ON CONFLICT(id) DO UPDATE SET
-                    description = excluded.description,
-                    difficulty = excluded.difficulty,
-                    proficiency = excluded.proficiency,
-                    aliases = excluded.aliases,
-                    metadata = excluded.metadata,
-                    updated_at = CURRENT_TIMESTAMP
-            ''', (
-                node.id,
-                node.description,
-                node.difficulty,
-                node.proficiency,
-                json.dumps(node.aliases, ensure_ascii=False),
-                json.dumps(node.metadata, ensure_ascii=False)
-            ))
+            conn.execute(_UPSERT_NODE_SQL, self._node_params(node))
+            self._sync_aliases(conn, node.id, node.aliases)
         return node.id
 
+    def add_nodes(self, nodes: List[KnowledgeNode]) -> int:
+        """批量添加或更新节点（单事务，冲突处理与 add_node 一致）"""
+        nodes = list(nodes)
+        if not nodes:
+            return 0
+        with self._get_conn() as conn:
+            conn.executemany(_UPSERT_NODE_SQL, [self._node_params(node) for node in nodes])
+            self._sync_aliases_many(conn, [(node.id, node.aliases) for node in nodes])
+        return len(nodes)
+
+    @staticmethod
+    def _row_to_node(row: sqlite3.Row) -> KnowledgeNode:
+        return KnowledgeNode(
+            id=row["id"],
+            description=row["description"],
+            difficulty=row["difficulty"],
+            proficiency=row["proficiency"],
+            aliases=json.loads(row["aliases"]),
+            metadata=json.loads(row["metadata"])
+        )
+
+    @staticmethod
+    def _row_to_node_row(row: sqlite3.Row) -> NodeRow:
+        return NodeRow(**{key: row[key] for key in row.keys()})
+
     def get_node(self, node_id: str) -> Optional[KnowledgeNode]:
         """获取节点"""
         with self._get_conn() as conn:
@@ -107,16 +924,29 @@ class SQLiteGraphStore(BaseGraphStorage):
             ).fetchone()
 
             if row:
-                return KnowledgeNode(
-                    id=row["id"],
-                    description=row["description"],
-                    difficulty=row["difficulty"],
-                    proficiency=row["proficiency"],
-                    aliases=json.loads(row["aliases"]),
-                    metadata=json.loads(row["metadata"])
-                )
+                return self._row_to_node(row)
         return None
 
+    def get_nodes(
+            self,
+            node_ids: List[str],
+            fields: Optional[Sequence[str]] = None
+    ) -> Dict[str, Union[KnowledgeNode, NodeRow]]:
+        """批量获取节点，按 IN (...) 分块查询；指定 fields 时只读取这些列并返回 NodeRow"""
+        node_ids = list(dict.fromkeys(node_ids))
+        columns = "*" if fields is None else ", ".join(check_node_fields(fields))
+        nodes = {}
+        with self._get_conn() as conn:
+            for start in range(0, len(node_ids), _IN_CHUNK_SIZE):
+                chunk = node_ids[start:start + _IN_CHUNK_SIZE]
+                placeholders = ",".join("?" * len(chunk))
+                rows = conn.execute(
+                    f"SELECT {columns} FROM nodes WHERE id IN ({placeholders})", chunk
+                ).fetchall()
+                for row in rows:
+                    nodes[row["id"]] = self._row_to_node(row) if fields is None else self._row_to_node_row(row)
+        return nodes
+
     def update_node(self, node: KnowledgeNode) -> bool:
         """更新节点"""
         with self._get_conn() as conn:
@@ -137,31 +967,224 @@ class SQLiteGraphStore(BaseGraphStorage):
                 json.dumps(node.metadata, ensure_ascii=False),
                 node.id
             ))
-            return cursor.rowcount > 0
+            if cursor.rowcount > 0:
+                self._sync_aliases(conn, node.id, node.aliases)
+                return True
+            return False
 
     def delete_node(self, node_id: str) -> bool:
         """删除节点及相关边"""
         with self._get_conn() as conn:
+            if not conn.in_transaction:
+                conn.execute("BEGIN IMMEDIATE")
+            if self.closure_table:
+                self._closure_remove_node(conn, node_id)
             conn.execute("DELETE FROM edges WHERE source = ? OR target = ?",
                          (node_id, node_id))
+            conn.execute("DELETE FROM node_aliases WHERE node_id = ?", (node_id,))
+            conn.execute("DELETE FROM topo_order WHERE node_id = ?", (node_id,))
             cursor = conn.execute("DELETE FROM nodes WHERE id = ?", (node_id,))
-            return cursor.rowcount > 0
+            deleted = cursor.rowcount > 0
+            self._edges_changed(conn, lambda adj: adj.remove_node(node_id))
+        return deleted
+
+    def merge_nodes(self, source_id: str, target_id: str) -> bool:
+        """把 source 合并进 target（单事务，按 source 的度数而非整图规模执行）
+
+        source 的边用 UPDATE OR IGNORE 改接到 target（target 已有的同向边保留），
+        两者之间的边丢弃；别名、元数据和题目关联并入 target 后删除 source。
+        合并会形成环时抛出 ValueError 并整体回滚；任一节点不存在时返回 False。
+        """
+        if source_id == target_id:
+            return False
 
-    def add_edge(self, edge: KnowledgeEdge) -> bool:
-        """添加边"""
         with self._get_conn() as conn:
+            if not conn.in_transaction:
+                conn.execute("BEGIN IMMEDIATE")
+            rows = {
+                row["id"]: row
+                for row in conn.execute(
+                    "SELECT id, aliases, metadata FROM nodes WHERE id IN (?, ?)", (source_id, target_id)
+                )
+            }
+            if len(rows) < 2:
+                return False
+
+            # 改接后新增的边（target 已有的同向边会被 OR IGNORE 跳过）
+            existing = {
+                (row["source"], row["target"])
+                for row in conn.execute(
+                    "SELECT source, target FROM edges WHERE source = :t OR target = :t", {"t": target_id}
+                )
+            }
+            new_edges = []
+            for row in conn.execute('''
+                SELECT source, target, weight FROM edges
+                WHERE (source = :s AND target != :t) OR (target = :s AND source != :t)
+            ''', {"s": source_id, "t": target_id}):
+                source = target_id if row["source"] == source_id else row["source"]
+                target = target_id if row["target"] == source_id else row["target"]
+                if (source, target) not in existing:
+                    new_edges.append((source, target, row["weight"]))
+
+            # 先维护拓扑序，成环时在改动边之前抛出
+            orders: Dict[str, int] = {}
+            for source, target, _ in new_edges:
+                orders.update(self._topo_add_edge(conn, source, target))
+
+            if self.closure_table:
+                self._closure_remove_node(conn, source_id)
+            conn.execute(
+                "DELETE FROM edges WHERE (source = :s AND target = :t) OR (source = :t AND target = :s)",
+                {"s": source_id, "t": target_id}
+            )
+            conn.execute("UPDATE OR IGNORE edges SET source = ? WHERE source = ?", (target_id, source_id))
+            conn.execute("UPDATE OR IGNORE edges SET target = ? WHERE target = ?", (target_id, source_id))
+            conn.execute("DELETE FROM edges WHERE source = ? OR target = ?", (source_id, source_id))
+            if self.closure_table:
+                for source, target, _ in new_edges:
+                    self._closure_add_edge(conn, source, target)
+
+            # 题目关联改挂到 target
             conn.execute('''
-                INSERT OR REPLACE INTO edges (source, target, weight, relation_type, metadata)
-                VALUES (?, ?, ?, ?, ?)
+                UPDATE problems SET linked_nodes = (
+                    SELECT json_group_array(DISTINCT CASE value WHEN :s THEN :t ELSE value END)
+                    FROM json_each(problems.linked_nodes)
+                )
+                WHERE id IN (SELECT problem_id FROM problem_nodes WHERE node_id = :s)
+            ''', {"s": source_id, "t": target_id})
+            conn.execute("UPDATE OR IGNORE problem_nodes SET node_id = ? WHERE node_id = ?", (target_id, source_id))
+            conn.execute("DELETE FROM problem_nodes WHERE node_id = ?", (source_id,))
+
+            conn.execute("DELETE FROM node_aliases WHERE node_id = ?", (source_id,))
+            conn.execute("DELETE FROM topo_order WHERE node_id = ?", (source_id,))
+            conn.execute("DELETE FROM nodes WHERE id = ?", (source_id,))
+
+            # 别名与元数据一次写入（source 的元数据覆盖同名键）
+            source_row, target_row = rows[source_id], rows[target_id]
+            aliases = [
+                alias for alias in dict.fromkeys(
+                    json.loads(target_row["aliases"]) + json.loads(source_row["aliases"]) + [source_id]
+                )
+                if alias != target_id
+            ]
+            metadata = {**json.loads(target_row["metadata"]), **json.loads(source_row["metadata"])}
+            conn.execute('''
+                UPDATE nodes SET aliases = ?, metadata = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?
             ''', (
-                edge.source,
-                edge.target,
-                edge.weight,
-                edge.relation_type,
-                json.dumps(edge.metadata, ensure_ascii=False)
+                json.dumps(aliases, ensure_ascii=False),
+                json.dumps(metadata, ensure_ascii=False),
+                target_id
             ))
+            self._sync_aliases(conn, target_id, aliases)
+
+            def change(adj: AdjacencyIndex):
+                adj.order.update(orders)
+                adj.remove_node(source_id)
+                for source, target, weight in new_edges:
+                    adj.add_edge(source, target, weight)
+
+            self._edges_changed(conn, change)
         return True
 
+    def clear(self) -> int:
+        """删除全部节点和边（题目保留），返回删除的节点数
+
+        单事务内暂时移除 nodes/edges 上的行级触发器（计数器、变更日志、全文索引），
+        整表 DELETE 后再原样重建，计数器与全文索引直接重置，变更日志只记一条 clear；
+        提交后 VACUUM 回收空间。
+        """
+        with self._get_conn() as conn:
+            if not conn.in_transaction:
+                conn.execute("BEGIN IMMEDIATE")
+            count = conn.execute("SELECT COUNT(*) FROM nodes").fetchone()[0]
+
+            triggers = conn.execute(
+                "SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name IN ('nodes', 'edges')"
+            ).fetchall()
+            for trigger in triggers:
+                conn.execute(f"DROP TRIGGER {trigger['name']}")
+
+            for table in ("edges", "nodes", "node_aliases", "topo_order", "closure"):
+                conn.execute(f"DELETE FROM {table}")
+            if self._fts_tokenizer is not None:
+                conn.execute("INSERT INTO nodes_fts (nodes_fts) VALUES ('delete-all')")
+            conn.execute("UPDATE graph_counters SET value = 0 WHERE name != 'problem_count'")
+            if any(trigger["name"].startswith("trg_changes_") for trigger in triggers):
+                conn.execute(
+                    "INSERT INTO changes (entity, op, entity_id) VALUES ('graph', 'clear', '')"
+                )
+
+            for trigger in triggers:
+                conn.execute(trigger["sql"])
+
+            def change(adj: AdjacencyIndex):
+                adj.forward.clear()
+                adj.reverse.clear()
+                adj.order.clear()
+
+            self._edges_changed(conn, change)
+            self.call_after_commit(self._vacuum)
+        return count
+
+    def _vacuum(self):
+        """回收空闲页（不能在事务内执行）"""
+        conn = self._acquire()
+        try:
+            conn.execute("VACUUM")
+        except sqlite3.OperationalError:
+            # 其他连接正在读写时放弃，下次清空时再回收
+            pass
+        finally:
+            if not self.pooled:
+                conn.close()
+
+    def add_edge(self, edge: KnowledgeEdge) -> bool:
+        """添加边（会形成环时抛出 ValueError）"""
+        return self.add_edges([edge]) == 1
+
+    def add_edges(self, edges: List[KnowledgeEdge]) -> int:
+        """批量添加边（单事务，冲突处理与 add_edge 一致；任一条边成环则整体回滚）"""
+        edges = list(edges)
+        if not edges:
+            return 0
+
+        orders: Dict[str, int] = {}
+        with self._get_conn() as conn:
+            if not conn.in_transaction:
+                # 环检测与拓扑序的读取必须和写入处于同一把写锁下，否则并发写者可能各自通过检测后形成环
+                conn.execute("BEGIN IMMEDIATE")
+            for edge in edges:
+                # 逐条维护拓扑序，后一条边的检测需要看到前一条边
+                orders.update(self._topo_add_edge(conn, edge.source, edge.target))
+                conn.execute(_UPSERT_EDGE_SQL, self._edge_params(edge))
+                if self.closure_table:
+                    self._closure_add_edge(conn, edge.source, edge.target)
+
+            def change(adj: AdjacencyIndex):
+                adj.order.update(orders)
+                for edge in edges:
+                    adj.add_edge(edge.source, edge.target, edge.weight)
+
+            self._edges_changed(conn, change)
+        return len(edges)
+
+    def _neighbor_edges(self, node_ids: List[str], direction: str) -> List[Tuple[str, str, float]]:
+        """node_ids 的入边（up）或出边（down），按 IN (...) 分块走 source / target 索引"""
+        column = "target" if direction == "up" else "source"
+        edges = []
+        with self._get_conn() as conn:
+            for start in range(0, len(node_ids), _IN_CHUNK_SIZE):
+                chunk = node_ids[start:start + _IN_CHUNK_SIZE]
+                placeholders = ",".join("?" * len(chunk))
+                edges.extend(
+                    (row["source"], row["target"], row["weight"])
+                    for row in conn.execute(
+                        f"SELECT source, target, weight FROM edges WHERE {column} IN ({placeholders})", chunk
+                    )
+                )
+        return edges
+
     def get_prerequisites(self, node_id: str) -> List[str]:
         """获取前置知识"""
         with self._get_conn() as conn:
@@ -178,92 +1201,214 @@ class SQLiteGraphStore(BaseGraphStorage):
             ).fetchall()
             return [row["target"] for row in rows]
 
-    def get_all_nodes(self) -> List[KnowledgeNode]:
-        """获取所有节点"""
+    def get_all_nodes(self, fields: Optional[Sequence[str]] = None) -> List[Union[KnowledgeNode, NodeRow]]:
+        """获取所有节点；指定 fields 时只读取这些列，返回延迟解码 JSON 的 NodeRow"""
         with self._get_conn() as conn:
-            rows = conn.execute("SELECT * FROM nodes ORDER BY id").fetchall()
-            return [
-                KnowledgeNode(
-                    id=row["id"],
-                    description=row["description"],
-                    difficulty=row["difficulty"],
-                    proficiency=row["proficiency"],
-                    aliases=json.loads(row["aliases"]),
-                    metadata=json.loads(row["metadata"])
-                )
-                for row in rows
-            ]
+            if fields is None:
+                rows = conn.execute("SELECT * FROM nodes ORDER BY id").fetchall()
+                return [self._row_to_node(row) for row in rows]
+
+            columns = ", ".join(check_node_fields(fields))
+            rows = conn.execute(f"SELECT {columns} FROM nodes ORDER BY id").fetchall()
+            return [self._row_to_node_row(row) for row in rows]
+
+    @staticmethod
+    def _row_to_edge(row: sqlite3.Row) -> KnowledgeEdge:
+        return KnowledgeEdge(
+            source=row["source"],
+            target=row["target"],
+            weight=row["weight"],
+            relation_type=row["relation_type"],
+            metadata=json.loads(row["metadata"])
+        )
 
     def get_all_edges(self) -> List[KnowledgeEdge]:
         """获取所有边"""
         with self._get_conn() as conn:
             rows = conn.execute("SELECT * FROM edges").fetchall()
-            return [
-                KnowledgeEdge(
-                    source=row["source"],
-                    target=row["target"],
-                    weight=row["weight"],
-                    relation_type=row["relation_type"],
-                    metadata=json.loads(row["metadata"])
-                )
-                for row in rows
-            ]
+            return [self._row_to_edge(row) for row in rows]
+
+    def iter_nodes(
+            self,
+            batch_size: int = 500,
+            after: Optional[str] = None,
+            fields: Optional[Sequence[str]] = None
+    ) -> Iterator[Union[KnowledgeNode, NodeRow]]:
+        """按 ID 键集分页遍历节点
 
-    def node_exists(self, node_id: str) -> bool:
-        """检查节点是否存在"""
-        return self.get_node(node_id) is not None
+        每页单独查询、页与页之间不持有读事务，内存占用只与 batch_size 有关；
+        遍历过程中删除已访问过的节点是安全的。
+        """
+        columns = "*" if fields is None else ", ".join(check_node_fields(fields))
+        to_node = self._row_to_node if fields is None else self._row_to_node_row
+        while True:
+            with self._get_conn() as conn:
+                if after is None:
+                    rows = conn.execute(
+                        f"SELECT {columns} FROM nodes ORDER BY id LIMIT ?", (batch_size,)
+                    ).fetchall()
+                else:
+                    rows = conn.execute(
+                        f"SELECT {columns} FROM nodes WHERE id > ? ORDER BY id LIMIT ?",
+                        (after, batch_size)
+                    ).fetchall()
+
+            for row in rows:
+                yield to_node(row)
+            if len(rows) < batch_size:
+                return
+            after = rows[-1]["id"]
+
+    def iter_edges(
+            self,
+            batch_size: int = 500,
+            after: Optional[Tuple[str, str]] = None
+    ) -> Iterator[KnowledgeEdge]:
+        """按 (source, target) 主键键集分页遍历边"""
+        while True:
+            with self._get_conn() as conn:
+                if after is None:
+                    rows = conn.execute(
+                        "SELECT * FROM edges ORDER BY source, target LIMIT ?", (batch_size,)
+                    ).fetchall()
+                else:
+                    rows = conn.execute(
+                        "SELECT * FROM edges WHERE (source, target) > (?, ?) "
+                        "ORDER BY source, target LIMIT ?",
+                        (*after, batch_size)
+                    ).fetchall()
+
+            for row in rows:
+                yield self._row_to_edge(row)
+            if len(rows) < batch_size:
+                return
+            after = (rows[-1]["source"], rows[-1]["target"])
+
+    def get_compact_graph(self) -> CompactGraph:
+        """流式读取游标构建紧凑只读图，不为每行创建 KnowledgeNode / KnowledgeEdge"""
+        with self._get_conn() as conn:
+            return CompactGraph.build(
+                conn.execute("SELECT id, difficulty, proficiency FROM nodes ORDER BY id"),
+                conn.execute("SELECT source, target, weight FROM edges ORDER BY source, target")
+            )
 
     def find_by_alias(self, alias: str) -> Optional[str]:
-        """通过别名查找节点"""
+        """通过别名查找节点（大小写不敏感，优先匹配节点 ID）"""
         with self._get_conn() as conn:
-            rows = conn.execute("SELECT id, aliases FROM nodes").fetchall()
-            for row in rows:
-                if row["id"].lower() == alias.lower():
-                    return row["id"]
-                aliases = json.loads(row["aliases"])
-                if any(a.lower() == alias.lower() for a in aliases):
-                    return row["id"]
-        return None
+            row = conn.execute('''
+                SELECT node_id FROM node_aliases
+                WHERE alias_key = ?
+                ORDER BY is_primary DESC
+                LIMIT 1
+            ''', (alias.lower(),)).fetchone()
+            return row["node_id"] if row else None
 
     def get_learning_path(self, target_node: str) -> List[str]:
-        """获取学习路径（拓扑排序）"""
-        G = nx.DiGraph()
-        for edge in self.get_all_edges():
-            G.add_edge(edge.source, edge.target, weight=edge.weight)
+        """获取学习路径（按持久化的拓扑序输出）"""
+        if self.closure_table:
+            # 前置集合与顺序都由索引直接读出
+            with self._get_conn() as conn:
+                self._ensure_closure(conn)
+                rows = conn.execute('''
+                    SELECT c.ancestor FROM closure c
+                    LEFT JOIN topo_order t ON t.node_id = c.ancestor
+                    WHERE c.descendant = ?
+                    ORDER BY t.ord, c.ancestor
+                ''', (target_node,)).fetchall()
+            return [row["ancestor"] for row in rows] + [target_node]
 
-        if target_node not in G:
-            return [target_node]
+        with self._adjacency_lock:
+            adjacency = self._load_adjacency()
+            ancestors = adjacency.ancestors(target_node)
+            return adjacency.sort_by_order(ancestors) + [target_node]
 
-        ancestors = nx.ancestors(G, target_node)
-        sub_nodes = list(ancestors) + [target_node]
-        sub_G = G.subgraph(sub_nodes)
+    # 库内递归遍历
+    @staticmethod
+    def _walk_cte(direction: str, max_depth: Optional[int]) -> str:
+        """生成沿边递归遍历的 CTE（walk 表），direction 为 'up'(前置) 或 'down'(后续)"""
+        step, join = ("source", "target") if direction == "up" else ("target", "source")
+        if max_depth is None:
+            # 不携带深度，UNION 按 id 去重，遇到环也能终止
+            return f'''
+                WITH RECURSIVE walk(id) AS (
+                    SELECT :node_id
+                    UNION
+                    SELECT e.{step} FROM edges e JOIN walk w ON e.{join} = w.id
+                )
+            '''
+        return f'''
+            WITH RECURSIVE walk(id, depth) AS (
+                SELECT :node_id, 0
+                UNION
+                SELECT e.{step}, w.depth + 1 FROM edges e JOIN walk w ON e.{join} = w.id
+                WHERE w.depth < :max_depth
+            )
+        '''
 
-        try:
-            return list(nx.topological_sort(sub_G))
-        except nx.NetworkXUnfeasible:
-            return list(ancestors) + [target_node]
+    def _walk(self, node_id: str, direction: str, max_depth: Optional[int]) -> List[str]:
+        with self._get_conn() as conn:
+            rows = conn.execute(
+                self._walk_cte(direction, max_depth)
+                + "SELECT DISTINCT id FROM walk WHERE id != :node_id ORDER BY id",
+                {"node_id": node_id, "max_depth": max_depth}
+            ).fetchall()
+            return [row["id"] for row in rows]
+
+    def get_ancestors(self, node_id: str, max_depth: Optional[int] = None) -> List[str]:
+        """获取所有前置知识（启用闭包表时直接查表，否则 WITH RECURSIVE，可限制深度）"""
+        if self.closure_table:
+            return self._closure_related(node_id, "up", max_depth)
+        return self._walk(node_id, "up", max_depth)
+
+    def get_descendants(self, node_id: str, max_depth: Optional[int] = None) -> List[str]:
+        """获取所有后续知识（启用闭包表时直接查表，否则 WITH RECURSIVE，可限制深度）"""
+        if self.closure_table:
+            return self._closure_related(node_id, "down", max_depth)
+        return self._walk(node_id, "down", max_depth)
+
+    def get_learning_path_sql(self, target_node: str, max_depth: Optional[int] = None) -> List[str]:
+        """在 SQLite 内求前置子图并按持久化拓扑序排序，只读取子图涉及的行"""
+        with self._get_conn() as conn:
+            rows = conn.execute(
+                self._walk_cte("up", max_depth) + '''
+                SELECT DISTINCT w.id FROM walk w
+                LEFT JOIN topo_order t ON t.node_id = w.id
+                WHERE w.id != :node_id
+                ORDER BY t.ord, w.id
+                ''',
+                {"node_id": target_node, "max_depth": max_depth}
+            ).fetchall()
+        return [row["id"] for row in rows] + [target_node]
 
     # 题目管理
-    def add_problem(self, problem: Problem) -> int:
-        """添加题目"""
+    def add_problems(self, problems: List[Problem]) -> List[int]:
+        """批量添加题目（单事务），返回新题目 ID"""
+        problem_ids = []
+        links = []
         with self._get_conn() as conn:
-            cursor = conn.execute('''
-                INSERT INTO problems (content, linked_nodes, difficulty)
-                VALUES (?, ?, ?)
-            ''', (
-                problem.content,
-                json.dumps(problem.linked_nodes, ensure_ascii=False),
-                problem.difficulty
-            ))
-            return cursor.lastrowid
+            for problem in problems:
+                cursor = conn.execute(_INSERT_PROBLEM_SQL, (
+                    problem.content,
+                    json.dumps(problem.linked_nodes, ensure_ascii=False),
+                    problem.difficulty
+                ))
+                problem_ids.append(cursor.lastrowid)
+                links.extend((cursor.lastrowid, node_id) for node_id in problem.linked_nodes)
+            conn.executemany(
+                "INSERT OR IGNORE INTO problem_nodes (problem_id, node_id) VALUES (?, ?)",
+                links
+            )
+        return problem_ids
 
     def get_problems_by_node(self, node_id: str) -> List[Problem]:
         """获取节点相关的题目"""
         with self._get_conn() as conn:
             rows = conn.execute('''
-                SELECT * FROM problems 
-                WHERE linked_nodes LIKE ?
-            ''', (f'%"{node_id}"%',)).fetchall()
+                SELECT p.* FROM problem_nodes pn
+                JOIN problems p ON p.id = pn.problem_id
+                WHERE pn.node_id = ?
+                ORDER BY p.id
+            ''', (node_id,)).fetchall()
 
             return [
                 Problem(
@@ -276,40 +1421,194 @@ class SQLiteGraphStore(BaseGraphStorage):
             ]
 
     def get_statistics(self) -> Dict[str, Any]:
-        """获取统计信息"""
+        """获取统计信息（启用 stat_counters 时直接读取计数器表）"""
         with self._get_conn() as conn:
-            node_count = conn.execute("SELECT COUNT(*) FROM nodes").fetchone()[0]
-            edge_count = conn.execute("SELECT COUNT(*) FROM edges").fetchone()[0]
-            problem_count = conn.execute("SELECT COUNT(*) FROM problems").fetchone()[0]
-
-            # 熟练度分布
-            rows = conn.execute("SELECT proficiency FROM nodes").fetchall()
-            dist = {"未学习": 0, "学习中": 0, "已掌握": 0}
-            for row in rows:
-                prof = row[0]
-                if prof < 0.3:
-                    dist["未学习"] += 1
-                elif prof < 0.7:
-                    dist["学习中"] += 1
-                else:
-                    dist["已掌握"] += 1
+            if not self.stat_counters:
+                return self._aggregate_statistics(conn)
 
+            counters = {
+                row["name"]: row["value"]
+                for row in conn.execute("SELECT name, value FROM graph_counters")
+            }
         return {
-            "node_count": node_count,
-            "edge_count": edge_count,
-            "problem_count": problem_count,
-            "proficiency_distribution": dist
+            "node_count": counters.get("node_count", 0),
+            "edge_count": counters.get("edge_count", 0),
+            "problem_count": counters.get("problem_count", 0),
+            "proficiency_distribution": {
+                "未学习": counters.get("unlearned", 0),
+                "学习中": counters.get("learning", 0),
+                "已掌握": counters.get("mastered", 0),
+            }
         }
 
-    def export_to_json(self, filepath: str):
-        """导出到 JSON"""
-        data = {
-            "nodes": [n.to_dict() for n in self.get_all_nodes()],
-            "edges": [
-                {"source": e.source, "target": e.target, "weight": e.weight}
-                for e in self.get_all_edges()
-            ],
-            "statistics": self.get_statistics()
+    @staticmethod
+    def _aggregate_statistics(conn: sqlite3.Connection) -> Dict[str, Any]:
+        """单条 SQL 聚合统计信息"""
+        row = conn.execute(f'''
+            SELECT
+                COUNT(*) AS node_count,
+                (SELECT COUNT(*) FROM edges) AS edge_count,
+                (SELECT COUNT(*) FROM problems) AS problem_count,
+                COALESCE(SUM({_BUCKET_SQL.format(p="proficiency")} = 'unlearned'), 0) AS unlearned,
+                COALESCE(SUM({_BUCKET_SQL.format(p="proficiency")} = 'learning'), 0) AS learning,
+                COALESCE(SUM({_BUCKET_SQL.format(p="proficiency")} = 'mastered'), 0) AS mastered
+            FROM nodes
+        ''').fetchone()
+
+        return {
+            "node_count": row["node_count"],
+            "edge_count": row["edge_count"],
+            "problem_count": row["problem_count"],
+            "proficiency_distribution": {
+                "未学习": row["unlearned"],
+                "学习中": row["learning"],
+                "已掌握": row["mastered"],
+            }
         }
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+
+    # 全文检索
+    def _lexical_rows(self, query: str, limit: int) -> List[sqlite3.Row]:
+        """全文索引召回候选（id, aliases, score），score 越大越相关
+
+        trigram 分词下不足 3 个字符的词无法走 MATCH，改为在 node_aliases 上按前缀做索引范围查找，
+        因此短词只匹配以其开头的 id / 别名，不再匹配描述。
+        """
+        terms = [term for term in re.split(r"[\W_]+", query) if term]
+        if not terms or self._fts_tokenizer is None:
+            return []
+
+        if self._fts_tokenizer == "trigram":
+            match_terms = [term for term in terms if len(term) >= 3]
+            prefix_terms = [term.lower() for term in terms if len(term) < 3]
+        else:
+            match_terms, prefix_terms = terms, []
+
+        # alias_key 已小写，前缀区间 [term, term + U+10FFFF) 走 idx_node_aliases_key
+        conditions, params = [], []
+        for term in prefix_terms:
+            conditions.append(
+                "n.id IN (SELECT node_id FROM node_aliases WHERE alias_key >= ? AND alias_key < ?)"
+            )
+            params.extend([term, term + "\U0010ffff"])
+
+        with self._get_conn() as conn:
+            if match_terms:
+                match = " AND ".join('"' + term.replace('"', '""') + '"' for term in match_terms)
+                where = " AND ".join(["nodes_fts MATCH ?"] + conditions)
+                return conn.execute(f'''
+                    SELECT n.id, n.aliases, -{_FTS_BM25_SQL} AS score
+                    FROM nodes_fts JOIN nodes n ON n.rowid = nodes_fts.rowid
+                    WHERE {where}
+                    ORDER BY {_FTS_BM25_SQL}
+                    LIMIT ?
+                ''', [match] + params + [limit]).fetchall()
+
+            # 只有短词：由第一个词的前缀区间驱动，完全匹配的排在前面，其余按名称长度
+            first = prefix_terms[0]
+            where = " AND ".join(conditions[1:]) or "1"
+            return conn.execute(f'''
+                SELECT n.id, n.aliases, 0.0 AS score
+                FROM (
+                    SELECT node_id, MAX(alias_key = ?) AS exact, MIN(length(alias_key)) AS len
+                    FROM node_aliases
+                    WHERE alias_key >= ? AND alias_key < ?
+                    GROUP BY node_id
+                ) a JOIN nodes n ON n.id = a.node_id
+                WHERE {where}
+                ORDER BY a.exact DESC, a.len, n.id
+                LIMIT ?
+            ''', [first] + params + [limit]).fetchall()
+
+    def search_lexical(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
+        """全文检索 id / description / aliases，按 BM25 排序"""
+        return [
+            {"id": row["id"], "score": row["score"]}
+            for row in self._lexical_rows(query, top_k)
+        ]
+
+    def find_by_text(self, query: str, min_coverage: float = 0.75) -> Optional[str]:
+        """全文索引中的高置信命中，没有时返回 None（由调用方退回向量检索）
+
+        只认 id / 别名中的匹配：归一化（忽略大小写、空白和标点）后查询串是名称的子串，
+        且占名称长度不低于 min_coverage；多个候选同样满足时视为有歧义。
+        """
+        key = normalize_text(query)
+        if not key:
+            return None
+
+        exact, partial = [], []
+        for row in self._lexical_rows(query, 10):
+            names = [row["id"]] + json.loads(row["aliases"])
+            coverage = max(
+                (len(key) / len(name) for name in map(normalize_text, names) if key in name),
+                default=0.0
+            )
+            if coverage >= 1.0:
+                exact.append(row["id"])
+            elif coverage >= min_coverage:
+                partial.append(row["id"])
+
+        if exact:
+            return exact[0] if len(exact) == 1 else None
+        return partial[0] if len(partial) == 1 else None
+
+    # 变更日志
+    @staticmethod
+    def _row_to_change(row: sqlite3.Row) -> Change:
+        return Change(
+            seq=row["seq"],
+            entity=row["entity"],
+            op=row["op"],
+            entity_id=row["entity_id"],
+            payload=json.loads(row["payload"]) if row["payload"] is not None else None,
+            created_at=row["created_at"]
+        )
+
+    def get_changes(self, since_seq: int = 0, limit: int = 1000) -> List[Change]:
+        """读取 seq 大于 since_seq 的变更（按 seq 升序）"""
+        with self._get_conn() as conn:
+            rows = conn.execute(
+                "SELECT * FROM changes WHERE seq > ? ORDER BY seq LIMIT ?",
+                (since_seq, limit)
+            ).fetchall()
+        return [self._row_to_change(row) for row in rows]
+
+    def latest_change_seq(self) -> int:
+        """当前最大的变更序号（已清理的序号不会被复用）"""
+        with self._get_conn() as conn:
+            row = conn.execute(
+                "SELECT seq FROM sqlite_sequence WHERE name = 'changes'"
+            ).fetchone()
+        return row["seq"] if row else 0
+
+    def prune_changes(self, before_seq: int) -> int:
+        """删除 seq 小于等于 before_seq 的变更，返回删除条数"""
+        with self._get_conn() as conn:
+            return conn.execute("DELETE FROM changes WHERE seq <= ?", (before_seq,)).rowcount
+
+    def subscribe(self, callback: Callable[[List[Change]], None]) -> Callable[[], None]:
+        """订阅本进程提交的变更，返回取消订阅函数
+
+        回调在写入事务提交后、于提交所在线程中调用，收到的是自上次推送以来新增的变更。
+        """
+        with self._publish_lock:
+            if not self._subscribers:
+                self._published_seq = self.latest_change_seq()
+            self._subscribers.append(callback)
+
+        def unsubscribe():
+            with self._publish_lock:
+                if callback in self._subscribers:
+                    self._subscribers.remove(callback)
+
+        return unsubscribe
+
+    def _publish_changes(self):
+        with self._publish_lock:
+            changes = self.get_changes(self._published_seq, limit=-1)
+            if not changes:
+                return
+            self._published_seq = changes[-1].seq
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            callback(changes)
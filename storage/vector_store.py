@@ -4,16 +4,25 @@
 """
 
 import json
-from typing import Dict, List, Any, Optional
+import threading
+from typing import Dict, List, Any, Optional, Tuple
 import chromadb
 from openai import OpenAI
 
 from config import get_settings
 from .base import BaseVectorStorage
+from .embedding_cache import EmbeddingCache
 
 
 class EmbeddingService:
-    """嵌入向量服务"""
+    """嵌入向量服务
+
+    先查进程内缓存，再查磁盘缓存（embedding_cache_path 非空时），都未命中才调用接口；
+    调用失败时返回的零向量不写入任何缓存。
+    """
+
+    _disk_caches: Dict[str, EmbeddingCache] = {}
+    _disk_lock = threading.Lock()
 
     def __init__(self):
         settings = get_settings()
@@ -23,24 +32,44 @@ class EmbeddingService:
         )
         self.model = settings.embedding_model
         self._cache: Dict[str, List[float]] = {}
+        self._disk = self._open_disk_cache(settings.embedding_cache_path)
+
+    @classmethod
+    def _open_disk_cache(cls, path: Optional[str]) -> Optional[EmbeddingCache]:
+        """同一路径的磁盘缓存在进程内共享（按用户分库时每个向量库各有一个 EmbeddingService）"""
+        if not path:
+            return None
+        with cls._disk_lock:
+            if path not in cls._disk_caches:
+                cls._disk_caches[path] = EmbeddingCache(path)
+            return cls._disk_caches[path]
 
     def embed(self, text: str) -> List[float]:
         """生成嵌入向量"""
         if text in self._cache:
             return self._cache[text]
 
+        if self._disk is not None:
+            embedding = self._disk.get(self.model, text)
+            if embedding is not None:
+                self._cache[text] = embedding
+                return embedding
+
         try:
             response = self.client.embeddings.create(
                 input=text,
                 model=self.model
             )
             embedding = response.data[0].embedding
-            self._cache[text] = embedding
-            return embedding
         except Exception as e:
             print(f"⚠️ Embedding 失败: {e}")
             return [0.0] * 1536
 
+        self._cache[text] = embedding
+        if self._disk is not None:
+            self._disk.put(self.model, text, embedding)
+        return embedding
+
     def embed_batch(self, texts: List[str]) -> List[List[float]]:
         """批量生成嵌入向量"""
         results = []
@@ -55,6 +84,18 @@ class EmbeddingService:
                 uncached.append(text)
                 uncached_indices.append(i)
 
+        if uncached and self._disk is not None:
+            stored = self._disk.get_many(self.model, uncached)
+            pending = []
+            for text, idx in zip(uncached, uncached_indices):
+                if text in stored:
+                    results[idx] = stored[text]
+                    self._cache[text] = stored[text]
+                else:
+                    pending.append((text, idx))
+            uncached = [text for text, _ in pending]
+            uncached_indices = [idx for _, idx in pending]
+
         if uncached:
             try:
                 response = self.client.embeddings.create(
@@ -69,6 +110,11 @@ class EmbeddingService:
                 print(f"⚠️ Batch embedding 失败: {e}")
                 for idx in uncached_indices:
                     results[idx] = [0.0] * 1536
+            else:
+                if self._disk is not None:
+                    self._disk.put_many(
+                        self.model, [(uncached[i], data.embedding) for i, data in enumerate(response.data)]
+                    )
 
         return results
 
@@ -76,13 +122,17 @@ class EmbeddingService:
 class ChromaVectorStore(BaseVectorStorage):
     """ChromaDB 向量存储"""
 
-    def __init__(self, persist_dir: str = "./chroma_db"):
+    def __init__(self, persist_dir: str = "./chroma_db", collection_name: str = "knowledge_nodes"):
         self.client = chromadb.PersistentClient(path=persist_dir)
-        self.collection = self.client.get_or_create_collection(
-            name="knowledge_nodes",
+        self.collection_name = collection_name
+        self.collection = self._open_collection()
+        self.embedding_service = EmbeddingService()
+
+    def _open_collection(self):
+        return self.client.get_or_create_collection(
+            name=self.collection_name,
             metadata={"hnsw:space": "cosine"}
         )
-        self.embedding_service = EmbeddingService()
 
     def add(self, id: str, text: str, metadata: Dict[str, Any] = None) -> bool:
         """添加或更新向量"""
@@ -101,6 +151,25 @@ class ChromaVectorStore(BaseVectorStorage):
             print(f"⚠️ 向量存储失败: {e}")
             return False
 
+    def add_batch(self, items: List[Tuple[str, str, Dict[str, Any]]]) -> bool:
+        """批量添加或更新向量，items 为 (id, text, metadata) 列表"""
+        if not items:
+            return True
+        ids, texts, metadatas = (list(column) for column in zip(*items))
+        embeddings = self.embedding_service.embed_batch(texts)
+
+        try:
+            self.collection.upsert(
+                ids=ids,
+                embeddings=embeddings,
+                metadatas=metadatas,
+                documents=texts
+            )
+            return True
+        except Exception as e:
+            print(f"⚠️ 批量向量存储失败: {e}")
+            return False
+
     def search(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
         """搜索相似向量"""
         try:
@@ -140,9 +209,13 @@ class ChromaVectorStore(BaseVectorStorage):
             return False
 
     def clear(self) -> bool:
-        """清空所有向量"""
+        """清空所有向量：直接删除并重建集合，不逐条删除"""
+        try:
+            self.client.delete_collection(self.collection_name)
+        except Exception:
+            pass
         try:
-            self.collection.delete(where={})
+            self.collection = self._open_collection()
             return True
         except Exception:
             return False
@@ -10,6 +10,7 @@ from .knowledge_tools import (
 from .graph_tools import (
     add_dependency,
     get_learning_path,
+    get_subgraph,
     get_graph_structure,
     delete_node,
     merge_nodes,
@@ -36,6 +37,7 @@ __all__ = [
     "list_all_nodes",
     "add_dependency",
     "get_learning_path",
+    "get_subgraph",
     "get_graph_structure",
     "merge_nodes",
     "init_database",
@@ -3,37 +3,149 @@
 工具基类和注册器 - LangChain 风格
 """
 
+import atexit
+import os
+from contextlib import nullcontext
+from contextvars import ContextVar
 from typing import Dict, List, Callable, Any, Optional, Type
 from dataclasses import dataclass, field
 from functools import wraps
 from langchain_core.tools import BaseTool, StructuredTool
 from pydantic import BaseModel, Field
 
-from storage import SQLiteGraphStore, ChromaVectorStore
+from storage import (
+    BaseGraphStorage,
+    SQLiteGraphStore,
+    MemoryGraphStore,
+    CachedGraphStore,
+    AsyncGraphStore,
+    ChromaVectorStore,
+    StoreRouter,
+    UserStores,
+    current_user,
+    user_slug
+)
 from config import get_settings
 
 
 @dataclass
 class ToolRegistry:
-    """工具注册器"""
+    """工具注册器
+
+    shard_by_user 开启时，graph_store / vector_store 按当前用户（current_user）路由到各自的库。
+    """
     _tools: Dict[str, BaseTool] = field(default_factory=dict)
-    _graph_store: Optional[SQLiteGraphStore] = None
+    _graph_store: Optional[BaseGraphStorage] = None
+    _async_graph_store: Optional[AsyncGraphStore] = None
     _vector_store: Optional[ChromaVectorStore] = None
+    _router: Optional[StoreRouter] = None
+
+    @staticmethod
+    def _create_graph_store(user_dir: Optional[str] = None) -> BaseGraphStorage:
+        """按配置创建图存储；user_dir 非空时数据文件放在该用户目录下"""
+        settings = get_settings()
+        store = ToolRegistry._create_backend(user_dir)
+        if settings.node_cache_size > 0:
+            store = CachedGraphStore(store, max_entries=settings.node_cache_size)
+        return store
+
+    @staticmethod
+    def _create_backend(user_dir: Optional[str] = None) -> BaseGraphStorage:
+        settings = get_settings()
+        if settings.graph_backend == "memory":
+            snapshot_path = settings.memory_snapshot_path
+            if user_dir is not None:
+                snapshot_path = os.path.join(user_dir, "snapshot.json")
+            return MemoryGraphStore(snapshot_path)
+
+        db_path = settings.sqlite_db_path
+        if user_dir is not None:
+            db_path = os.path.join(user_dir, "knowledge.db")
+        return SQLiteGraphStore(
+            db_path,
+            pooled=settings.sqlite_pooled,
+            synchronous=settings.sqlite_synchronous,
+            cache_size_kb=settings.sqlite_cache_size_kb,
+            mmap_size=settings.sqlite_mmap_size,
+            stat_counters=settings.sqlite_stat_counters,
+            closure_table=settings.sqlite_closure_table,
+            change_log=settings.sqlite_change_log
+        )
+
+    @staticmethod
+    def _open_user_stores(user_id: str) -> UserStores:
+        settings = get_settings()
+        slug = user_slug(user_id)
+        user_dir = os.path.join(settings.user_data_dir, slug)
+        os.makedirs(user_dir, exist_ok=True)
+
+        graph = ToolRegistry._create_graph_store(user_dir)
+        return UserStores(
+            graph=graph,
+            vector=ChromaVectorStore(settings.vector_db_path, collection_name=f"knowledge_nodes_{slug}"),
+            async_graph=AsyncGraphStore(graph, read_workers=settings.graph_read_workers)
+        )
+
+    @property
+    def router(self) -> Optional[StoreRouter]:
+        """按用户分库的路由器（未开启 shard_by_user 时为 None）"""
+        settings = get_settings()
+        if not settings.shard_by_user:
+            return None
+        if self._router is None:
+            self._router = StoreRouter(self._open_user_stores, settings.max_open_user_stores)
+            atexit.register(self._router.close)
+        return self._router
+
+    def lease(self):
+        """占用当前用户的存储句柄直到 with 块结束（未分库时为空操作）"""
+        router = self.router
+        return router.lease(current_user.get()) if router else nullcontext()
 
     @property
-    def graph_store(self) -> SQLiteGraphStore:
+    def graph_store(self) -> BaseGraphStorage:
+        router = self.router
+        if router:
+            return router.get(current_user.get()).graph
         if self._graph_store is None:
-            settings = get_settings()
-            self._graph_store = SQLiteGraphStore(settings.sqlite_db_path)
+            self._graph_store = self._create_graph_store()
+            # 退出时释放资源（内存后端会写回快照）
+            atexit.register(self._graph_store.close)
         return self._graph_store
 
+    @property
+    def async_graph_store(self) -> AsyncGraphStore:
+        router = self.router
+        if router:
+            return router.get(current_user.get()).async_graph
+        if self._async_graph_store is None:
+            settings = get_settings()
+            self._async_graph_store = AsyncGraphStore(
+                self.graph_store,
+                read_workers=settings.graph_read_workers
+            )
+        return self._async_graph_store
+
     @property
     def vector_store(self) -> ChromaVectorStore:
+        router = self.router
+        if router:
+            return router.get(current_user.get()).vector
         if self._vector_store is None:
             settings = get_settings()
             self._vector_store = ChromaVectorStore(settings.vector_db_path)
         return self._vector_store
 
+    def write(self, func: Callable, *args, **kwargs) -> Any:
+        """执行一段事务性的图变更
+
+        工具经 ainvoke 在读线程池中运行时，func 交给 async_graph_store 的写线程串行执行并等待结果；
+        同步调用时直接执行。func 内不要做向量检索或 embedding 等网络 I/O，这些放在调用方。
+        """
+        if _offload_writes.get():
+            return self.async_graph_store.call_write(func, *args, **kwargs)
+        return func(*args, **kwargs)
+
     def register(self, tool: BaseTool):
         """注册工具"""
         self._tools[tool.name] = tool
@@ -63,17 +175,39 @@ class ToolRegistry:
 # 全局工具注册器
 tool_registry = ToolRegistry()
 
+# 工具经异步路径执行时为 True：此时 tool_registry.write() 把图变更提交到写线程
+_offload_writes: ContextVar[bool] = ContextVar("offload_writes", default=False)
+
 
 def register_tool(
         name: str,
         description: str,
         args_schema: Optional[Type[BaseModel]] = None
 ):
-    """工具注册装饰器"""
+    """工具注册装饰器
+
+    同时注册异步版本：ainvoke 时整个工具函数在 async_graph_store 的读线程池中执行，
+    其中经 tool_registry.write() 提交的图变更进入写线程串行执行，向量检索与 embedding 不占用写线程。
+    执行期间占用当前用户的存储句柄，避免被分库路由器淘汰。
+    """
 
     def decorator(func: Callable):
+        @wraps(func)
+        def leased(*args, **kwargs):
+            with tool_registry.lease():
+                return func(*args, **kwargs)
+
+        def offloaded(*args, **kwargs):
+            _offload_writes.set(True)
+            return func(*args, **kwargs)
+
+        async def coroutine(*args, **kwargs):
+            with tool_registry.lease():
+                return await tool_registry.async_graph_store.run(offloaded, *args, **kwargs)
+
         tool = StructuredTool.from_function(
-            func=func,
+            func=leased,
+            coroutine=coroutine,
             name=name,
             description=description,
             args_schema=args_schema
@@ -3,7 +3,7 @@
 图谱分析工具
 """
 
-from typing import Optional, List
+from typing import Literal, Optional, List
 from pydantic import BaseModel, Field
 
 from .base import tool_registry, register_tool
@@ -28,36 +28,48 @@ def add_dependency(prerequisite: str, target: str, weight: float = 1.0) -> str:
         graph_store = tool_registry.graph_store
         vector_store = tool_registry.vector_store
 
-        # 智能查找或创建节点
-        prereq_id = graph_store.find_by_alias(prerequisite)
+        # 智能查找节点，不存在的节点在下方事务中与边一起创建
+        new_nodes = []
+
+        # 别名 → 全文索引 → 向量搜索，逐级退化
+        prereq_id = graph_store.find_by_alias(prerequisite) or graph_store.find_by_text(prerequisite)
         if not prereq_id:
             # 尝试向量搜索
             results = vector_store.search(prerequisite, top_k=1)
             if results and results[0]['similarity'] >= 0.8:
                 prereq_id = results[0]['id']
             else:
-                # 创建新节点
-                node = KnowledgeNode(id=prerequisite, proficiency=0.0)
-                prereq_id = graph_store.add_node(node)
-                vector_store.add(prereq_id, prerequisite, {"name": prereq_id})
+                prereq_id = prerequisite
+                new_nodes.append(KnowledgeNode(id=prerequisite, proficiency=0.0))
 
-        target_id = graph_store.find_by_alias(target)
+        target_id = graph_store.find_by_alias(target) or graph_store.find_by_text(target)
         if not target_id:
             results = vector_store.search(target, top_k=1)
             if results and results[0]['similarity'] >= 0.8:
                 target_id = results[0]['id']
             else:
-                node = KnowledgeNode(id=target, proficiency=0.0)
-                target_id = graph_store.add_node(node)
-                vector_store.add(target_id, target, {"name": target_id})
-
-        # 添加边
-        edge = KnowledgeEdge(
-            source=prereq_id,
-            target=target_id,
-            weight=weight
-        )
-        graph_store.add_edge(edge)
+                target_id = target
+                new_nodes.append(KnowledgeNode(id=target, proficiency=0.0))
+
+        def save():
+            with graph_store.transaction():
+                # 创建新节点
+                for node in new_nodes:
+                    graph_store.add_node(node)
+
+                # 添加边
+                edge = KnowledgeEdge(
+                    source=prereq_id,
+                    target=target_id,
+                    weight=weight
+                )
+                graph_store.add_edge(edge)
+
+        tool_registry.write(save)
+
+        # 提交后同步到向量库
+        for node in new_nodes:
+            vector_store.add(node.id, node.id, {"name": node.id})
 
         return f"✅ 添加依赖: 【{prereq_id}】→【{target_id}】"
     except Exception as e:
@@ -81,7 +93,7 @@ def get_learning_path(target_node: str) -> str:
         vector_store = tool_registry.vector_store
 
         # 查找节点
-        node_id = graph_store.find_by_alias(target_node)
+        node_id = graph_store.find_by_alias(target_node) or graph_store.find_by_text(target_node)
         if not node_id:
             results = vector_store.search(target_node, top_k=3)
             if results and results[0]['similarity'] >= 0.6:
@@ -101,8 +113,9 @@ def get_learning_path(target_node: str) -> str:
         lines = [f"📊 学习【{node_id}】的路径:"]
         unlearned = []
 
+        nodes = graph_store.get_nodes(path, fields=("proficiency",))
         for i, step in enumerate(path, 1):
-            node = graph_store.get_node(step)
+            node = nodes.get(step)
             if node:
                 prof = node.proficiency
                 status = "🟢" if prof >= 0.7 else "🟡" if prof >= 0.3 else "🔴"
@@ -121,6 +134,59 @@ def get_learning_path(target_node: str) -> str:
         return f"❌ 失败: {str(e)}"
 
 
+class GetSubgraphInput(BaseModel):
+    """获取邻域子图输入"""
+    node: str = Field(description="中心知识点")
+    max_hops: int = Field(default=2, ge=1, le=5, description="最多扩展的跳数")
+    max_nodes: int = Field(default=20, ge=1, le=100, description="最多返回的节点数")
+    direction: Literal["up", "down", "both"] = Field(
+        default="up", description="up=前置方向, down=后续方向, both=两个方向"
+    )
+
+
+@register_tool(
+    name="get_subgraph",
+    description="查看某知识点附近几跳内的局部图谱（节点数有上限，弱依赖和已掌握的节点优先省略），比整个图谱或完整学习路径更精简",
+    args_schema=GetSubgraphInput
+)
+def get_subgraph(node: str, max_hops: int = 2, max_nodes: int = 20, direction: str = "up") -> str:
+    """获取邻域子图"""
+    try:
+        graph_store = tool_registry.graph_store
+        vector_store = tool_registry.vector_store
+
+        # 查找节点
+        node_id = graph_store.find_by_alias(node) or graph_store.find_by_text(node)
+        if not node_id:
+            results = vector_store.search(node, top_k=1)
+            if results and results[0]['similarity'] >= 0.6:
+                node_id = results[0]['id']
+            else:
+                return f"❓ 未找到: {node}"
+
+        subgraph = graph_store.get_subgraph(
+            [node_id], max_hops=max_hops, max_nodes=max_nodes, direction=direction
+        )
+
+        lines = [f"🕸️ 【{node_id}】附近 {max_hops} 跳内的知识点（{len(subgraph.nodes)} 个）:"]
+        for row in subgraph.nodes:
+            prof = row.proficiency
+            status = "🟢" if prof >= 0.7 else "🟡" if prof >= 0.3 else "🔴"
+            lines.append(f"  [{subgraph.hops[row.id]}] {status} {row.id} ({prof:.0%}, 难度={row.difficulty})")
+
+        if subgraph.edges:
+            lines.append("\n📐 依赖关系:")
+            for edge in subgraph.edges:
+                lines.append(f"  {edge.source} → {edge.target} ({edge.weight:.1f})")
+
+        if subgraph.truncated:
+            lines.append("\n✂️ 已按节点上限省略部分相关度较低的知识点")
+
+        return "\n".join(lines)
+    except Exception as e:
+        return f"❌ 获取子图失败: {str(e)}"
+
+
 class GetGraphStructureInput(BaseModel):
     """获取图谱结构输入"""
     dummy: str = Field(default="", description="占位参数")
@@ -136,34 +202,24 @@ def get_graph_structure(dummy: str = "") -> str:
     try:
         graph_store = tool_registry.graph_store
 
-        nodes = graph_store.get_all_nodes()
-        edges = graph_store.get_all_edges()
+        graph = graph_store.get_compact_graph()
 
-        if not nodes:
+        if not len(graph):
             return "📭 图谱为空"
 
         lines = ["🗺️ 知识图谱结构:", "=" * 40]
 
-        # 构建关系映射
-        prereq_map = {}  # target -> [prerequisites]
-        depend_map = {}  # source -> [dependents]
-
-        for edge in edges:
-            prereq_map.setdefault(edge.target, []).append(edge.source)
-            depend_map.setdefault(edge.source, []).append(edge.target)
-
         # 找出根节点和叶子节点
-        all_ids = {n.id for n in nodes}
-        roots = [nid for nid in all_ids if nid not in prereq_map]
-        leaves = [nid for nid in all_ids if nid not in depend_map]
+        roots = graph.roots()
+        leaves = graph.leaves()
 
         lines.append(f"\n🌱 基础知识点（无前置）: {', '.join(roots) if roots else '无'}")
         lines.append(f"🎯 目标知识点（无后续）: {', '.join(leaves) if leaves else '无'}")
 
-        if edges:
+        if graph.edge_count:
             lines.append("\n📐 依赖关系:")
-            for edge in edges:
-                lines.append(f"  {edge.source} → {edge.target}")
+            for source, target, _ in graph.edges():
+                lines.append(f"  {source} → {target}")
 
         return "\n".join(lines)
     except Exception as e:
@@ -191,12 +247,12 @@ def delete_node(node_id: str) -> str:
         if not actual_id:
             return f"❌ 未找到节点: {node_id}"
 
-        # 删除向量
-        vector_store.delete(actual_id)
-        
         # 删除节点（会级联删除相关边）
-        graph_store.delete_node(actual_id)
-        
+        tool_registry.write(graph_store.delete_node, actual_id)
+
+        # 提交后删除向量
+        vector_store.delete(actual_id)
+
         return f"✅ 成功删除节点: {actual_id}"
     except Exception as e:
         return f"❌ 删除节点失败: {str(e)}"
@@ -230,58 +286,13 @@ def merge_nodes(source_node: str, target_node: str) -> str:
         if source_id == target_id:
             return f"❌ 源节点和目标节点相同，无需合并"
 
-        # 获取所有边
-        all_edges = graph_store.get_all_edges()
-        
-        # 处理边：将所有指向源节点的边改为指向目标节点，将所有从源节点出发的边改为从目标节点出发
-        for edge in all_edges:
-            if edge.source == source_id and edge.target == target_id:
-                # 删除自环边
-                continue
-            if edge.source == source_id:
-                # 源节点 → 其他节点 → 目标节点 → 其他节点
-                new_edge = KnowledgeEdge(
-                    source=target_id,
-                    target=edge.target,
-                    weight=edge.weight,
-                    relation_type=edge.relation_type,
-                    metadata=edge.metadata
-                )
-                graph_store.add_edge(new_edge)
-            elif edge.target == source_id:
-                # 其他节点 → 源节点 → 其他节点 → 目标节点
-                new_edge = KnowledgeEdge(
-                    source=edge.source,
-                    target=target_id,
-                    weight=edge.weight,
-                    relation_type=edge.relation_type,
-                    metadata=edge.metadata
-                )
-                graph_store.add_edge(new_edge)
-        
-        # 获取源节点和目标节点的属性
-        source_node_obj = graph_store.get_node(source_id)
-        target_node_obj = graph_store.get_node(target_id)
-        
-        # 合并属性（保留目标节点的主要属性，合并源节点的别名和元数据）
-        if source_node_obj and target_node_obj:
-            # 合并别名
-            merged_aliases = list(set(target_node_obj.aliases + source_node_obj.aliases + [source_id]))
-            # 合并元数据
-            merged_metadata = target_node_obj.metadata.copy()
-            merged_metadata.update(source_node_obj.metadata)
-            
-            # 更新目标节点
-            target_node_obj.aliases = merged_aliases
-            target_node_obj.metadata = merged_metadata
-            graph_store.update_node(target_node_obj)
-        
-        # 删除向量
+        # 边改接、别名与元数据合并、删除源节点在存储层一次完成
+        if not tool_registry.write(graph_store.merge_nodes, source_id, target_id):
+            return "❌ 合并节点失败: 节点不存在"
+
+        # 提交后删除向量
         vector_store.delete(source_id)
-        
-        # 删除源节点（会级联删除相关边）
-        graph_store.delete_node(source_id)
-        
+
         return f"✅ 成功合并节点: {source_id} → {target_id}"
     except Exception as e:
         return f"❌ 合并节点失败: {str(e)}"
@@ -306,14 +317,10 @@ def init_database(confirm: bool) -> str:
         graph_store = tool_registry.graph_store
         vector_store = tool_registry.vector_store
         
-        # 获取所有节点
-        nodes = graph_store.get_all_nodes()
-        
-        # 删除所有向量和节点
-        for node in nodes:
-            vector_store.delete(node.id)
-            graph_store.delete_node(node.id)
-        
-        return "✅ 数据库已成功清空初始化"
+        # 整表清空，向量集合在提交后整体重建
+        count = tool_registry.write(graph_store.clear)
+        vector_store.clear()
+
+        return f"✅ 数据库已成功清空初始化（删除 {count} 个节点）"
     except Exception as e:
         return f"❌ 初始化数据库失败: {str(e)}"
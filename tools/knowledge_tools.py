@@ -56,9 +56,9 @@ def add_knowledge_node(
         )
 
         # 存储到图数据库
-        actual_id = graph_store.add_node(node)
+        actual_id = tool_registry.write(graph_store.add_node, node)
 
-        # 同步到向量库
+        # 提交后同步到向量库
         search_text = f"{node_id} {description} {' '.join(alias_list)}".strip()
         vector_store.add(
             id=node_id,
@@ -105,7 +105,14 @@ def query_node(keyword: str) -> str:
                 node = graph_store.get_node(found_id)
                 keyword = found_id
 
-        # 3. 语义搜索
+        # 3. 全文索引（无需调用 embedding）
+        if not node:
+            found_id = graph_store.find_by_text(keyword)
+            if found_id:
+                node = graph_store.get_node(found_id)
+                keyword = found_id
+
+        # 4. 语义搜索
         if not node:
             results = vector_store.search(keyword, top_k=3)
             if results and results[0]['similarity'] >= 0.6:
@@ -158,8 +165,9 @@ def search_similar_nodes(keyword: str, top_k: int = 5) -> str:
             return f"❓ 没有找到与 '{keyword}' 相似的知识点"
 
         lines = [f"🔍 与 '{keyword}' 相似的知识点:"]
+        nodes = graph_store.get_nodes([r['id'] for r in results], fields=("proficiency",))
         for r in results:
-            node = graph_store.get_node(r['id'])
+            node = nodes.get(r['id'])
             if node:
                 prof = node.proficiency
                 status = "🟢" if prof >= 0.7 else "🟡" if prof >= 0.3 else "🔴"
@@ -197,8 +205,8 @@ def delete_knowledge_node(node_id: str) -> str:
         prereqs = graph_store.get_prerequisites(actual_id)
         dependents = graph_store.get_dependents(actual_id)
 
-        # 删除
-        graph_store.delete_node(actual_id)
+        # 删除，提交后删除向量
+        tool_registry.write(graph_store.delete_node, actual_id)
         vector_store.delete(actual_id)
 
         info = [f"✅ 已删除知识点: {actual_id}"]
@@ -226,10 +234,7 @@ def list_all_nodes(dummy: str = "") -> str:
     """列出所有知识点"""
     try:
         graph_store = tool_registry.graph_store
-        nodes = graph_store.get_all_nodes()
-
-        if not nodes:
-            return "📭 知识图谱为空，请先添加知识点"
+        nodes = graph_store.iter_nodes(fields=("description", "difficulty", "proficiency"))
 
         lines = ["📚 当前所有知识点:", "-" * 40]
 
@@ -252,6 +257,9 @@ def list_all_nodes(dummy: str = "") -> str:
             else:
                 unlearned.append(info)
 
+        if not (mastered or learning or unlearned):
+            return "📭 知识图谱为空，请先添加知识点"
+
         if mastered:
             lines.append(f"\n🟢 已掌握 ({len(mastered)}):")
             for item in mastered:
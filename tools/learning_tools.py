@@ -28,15 +28,19 @@ def update_proficiency(node_id: str, score: float) -> str:
 
         # 查找节点
         actual_id = graph_store.find_by_alias(node_id) or node_id
-        node = graph_store.get_node(actual_id)
+        score = max(0.0, min(1.0, float(score)))
 
-        if not node:
-            return f"❓ 未找到: {node_id}"
+        def save() -> bool:
+            # 读取与更新在同一事务中，避免覆盖并发写入
+            with graph_store.transaction():
+                node = graph_store.get_node(actual_id)
+                if not node:
+                    return False
+                node.proficiency = score
+                return graph_store.update_node(node)
 
-        # 更新熟练度
-        score = max(0.0, min(1.0, float(score)))
-        node.proficiency = score
-        graph_store.update_node(node)
+        if not tool_registry.write(save):
+            return f"❓ 未找到: {node_id}"
 
         status = "🔴未掌握" if score < 0.3 else "🟡学习中" if score < 0.7 else "🟢已掌握"
         return f"✅ 更新【{actual_id}】熟练度: {score:.0%} ({status})"
@@ -64,21 +68,19 @@ def add_problem(content: str, knowledge_points: str) -> str:
         kp_list = [k.strip() for k in knowledge_points.split(",") if k.strip()]
         results = []
         linked_nodes = []
+        new_nodes = []
 
         for kp in kp_list:
-            # 查找或创建节点
-            node_id = graph_store.find_by_alias(kp)
+            # 查找节点，不存在的节点在下方事务中与题目一起创建
+            node_id = graph_store.find_by_alias(kp) or graph_store.find_by_text(kp)
             if not node_id:
                 search_results = vector_store.search(kp, top_k=1)
                 if search_results and search_results[0]['similarity'] >= 0.8:
                     node_id = search_results[0]['id']
                 else:
-                    # 创建新节点
-                    node = KnowledgeNode(id=kp, proficiency=0.0)
-                    node_id = graph_store.add_node(node)
-                    vector_store.add(node_id, kp, {"name": node_id})
-                    results.append(f"  📌 新增知识点: {node_id}")
-                    linked_nodes.append(node_id)
+                    new_nodes.append(KnowledgeNode(id=kp, proficiency=0.0))
+                    results.append(f"  📌 新增知识点: {kp}")
+                    linked_nodes.append(kp)
                     continue
 
             results.append(f"  🔗 关联已有: {node_id}")
@@ -90,7 +92,16 @@ def add_problem(content: str, knowledge_points: str) -> str:
             linked_nodes=linked_nodes,
             difficulty=1
         )
-        graph_store.add_problem(problem)
+        def save():
+            with graph_store.transaction():
+                graph_store.add_nodes(new_nodes)
+                graph_store.add_problem(problem)
+
+        tool_registry.write(save)
+
+        # 提交后同步到向量库
+        for node in new_nodes:
+            vector_store.add(node.id, node.id, {"name": node.id})
 
         return f"📝 题目已记录，关联知识点:\n" + "\n".join(results)
     except Exception as e:
@@ -115,7 +126,7 @@ def get_unlearned_prerequisites(target_node: str, threshold: float = 0.7) -> str
         vector_store = tool_registry.vector_store
 
         # 查找节点
-        node_id = graph_store.find_by_alias(target_node)
+        node_id = graph_store.find_by_alias(target_node) or graph_store.find_by_text(target_node)
         if not node_id:
             results = vector_store.search(target_node, top_k=1)
             if results and results[0]['similarity'] >= 0.6:
@@ -127,8 +138,9 @@ def get_unlearned_prerequisites(target_node: str, threshold: float = 0.7) -> str
         path = graph_store.get_learning_path(node_id)
         unlearned = []
 
+        nodes = graph_store.get_nodes(path, fields=("difficulty", "proficiency"))
         for step in path:
-            node = graph_store.get_node(step)
+            node = nodes.get(step)
             if node and node.proficiency < threshold:
                 unlearned.append({
                     "id": step,